@@ -16,6 +16,15 @@ import datetime
 import argparse
 import signal
 import glob
+import math
+import errno
+import socket
+import struct
+import selectors
+import select
+from array import array
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
@@ -52,31 +61,667 @@ class SystemAlert:
     value: float
     threshold: float
 
+# Legion 5 Pro specific thresholds
+DEFAULT_THRESHOLDS = {
+    'cpu_temp': 85.0,        # AMD Ryzen 7 5800H
+    'gpu_temp': 78.0,        # RTX 3070 Mobile  
+    'nvme_temp': 70.0,       # NVMe SSD
+    'cpu_usage': 90.0,
+    'memory_usage': 85.0,
+    'gpu_power': 125.0,      # RTX 3070 Mobile max
+    'gpu_utilization': 95.0,
+    'disk_usage': 90.0,
+    'psi_cpu_some_avg10': 25.0,     # % of time some task waited for CPU
+    'psi_memory_some_avg10': 10.0,  # reclaim/swap stalls show up here first
+    'psi_io_some_avg10': 25.0
+}
+
+PSI_RESOURCES = ('cpu', 'memory', 'io')
+ENERGY_SOURCES = ('system', 'cpu', 'gpu')         # battery discharge, CPU package, dGPU
+ENERGY_FIELDS = ('j', 'w', 'session_j', 'session_w')
+
+# Fixed metric schema: (key, decimals). Order is the column layout of every
+# encoder and the fleet wire id, so only append.
+METRIC_SCHEMA = (
+    ('cpu_temp', 1), ('gpu_temp', 1), ('nvme_temp', 1), ('cpu_usage', 1), ('memory_usage', 1),
+    ('gpu_power', 1), ('gpu_utilization', 1), ('disk_usage', 1), ('gpu_throttle', 0),
+    ('cpu_freq', 0), ('load_1m', 2), ('memory_used_gb', 2), ('gpu_memory_percent', 1),
+    ('gpu_clock_core', 0), ('battery_percent', 0), ('battery_voltage', 2),
+    ('warning_count', 0), ('interval', 3)
+) + tuple(
+    (f'psi_{resource}_{kind}_{field}', 3 if field == 'total' else 2)
+    for resource in PSI_RESOURCES for kind in ('some', 'full')
+    for field in ('avg10', 'avg60', 'total')
+) + (('psi_events', 0),) + tuple(
+    (f'energy_{source}_{field}', 1) for source in ENERGY_SOURCES for field in ENERGY_FIELDS
+) + (('sample_period', 3),)
+METRIC_KEYS = tuple(key for key, _ in METRIC_SCHEMA)
+METRIC_INDEX = {key: index for index, key in enumerate(METRIC_KEYS)}
+NAN = float('nan')
+# First slot of each PSI (avg10, avg60, total) triple and each energy block
+PSI_SLOTS = tuple((resource, kind, METRIC_INDEX[f'psi_{resource}_{kind}_avg10'])
+                  for resource in PSI_RESOURCES for kind in ('some', 'full'))
+ENERGY_SLOTS = tuple((source, METRIC_INDEX[f'energy_{source}_j']) for source in ENERGY_SOURCES)
+EMPTY_VALUES = array('d', [NAN]) * len(METRIC_KEYS)
+
+def _classify_temp(name: str) -> Optional[str]:
+    """Schema key for a temperature sensor name"""
+    if 'CPU' in name:
+        return 'cpu_temp'
+    if 'GPU' in name:
+        return 'gpu_temp'
+    if 'NVMe' in name:
+        return 'nvme_temp'
+    return None
+
+def flatten_state(state: Dict) -> Dict[str, float]:
+    """Reduce a legacy nested state dict (pre-snapshot JSON logs) to schema keys"""
+    values = {}
+    for temp in state['temperatures']:
+        key = _classify_temp(temp['name'])
+        if key:
+            values[key] = max(values.get(key, temp['temp']), temp['temp'])
+
+    gpu = state['gpu']
+    if gpu['available']:
+        values['gpu_temp'] = max(values.get('gpu_temp', gpu['temp']), gpu['temp'])
+        values['gpu_power'] = gpu['power']
+        values['gpu_utilization'] = gpu['utilization']
+        values['gpu_throttle'] = 1.0 if gpu['throttle_reasons'] else 0.0
+
+    system = state['system']
+    values['cpu_usage'] = system['cpu_usage']
+    values['memory_usage'] = system['memory']['percent']
+    if system['disk_usage']:
+        values['disk_usage'] = max(disk['percent'] for disk in system['disk_usage'])
+    return values
+
+class Snapshot:
+    """One monitor tick reduced to the fixed metric vector; the collector dicts are not kept"""
+    __slots__ = ('time', 'values', 'errors', 'warnings', 'alerts_today')
+
+    def __init__(self, temperatures: List[TempReading], gpu: Dict, system: Dict, battery: Dict,
+                 errors: Optional[List[Dict]] = None, warnings: Optional[List[str]] = None, alerts_today: int = 0,
+                 when: Optional[float] = None, pressure: Optional[Dict] = None,
+                 pressure_events: int = 0, energy: Optional[Dict] = None):
+        self.time = time.time() if when is None else when
+        # Empty tuples are shared, so a quiet tick keeps no lists alive
+        self.errors = errors or ()
+        self.warnings = warnings or ()
+        self.alerts_today = alerts_today
+
+        cpu_temp = gpu_temp = nvme_temp = NAN
+        for reading in temperatures:
+            key = _classify_temp(reading.name)
+            # NaN compares False, so the first reading always wins over it
+            if key == 'cpu_temp' and not reading.temp <= cpu_temp:
+                cpu_temp = reading.temp
+            elif key == 'gpu_temp' and not reading.temp <= gpu_temp:
+                gpu_temp = reading.temp
+            elif key == 'nvme_temp' and not reading.temp <= nvme_temp:
+                nvme_temp = reading.temp
+
+        gpu_power = gpu_util = gpu_throttle = gpu_mem = gpu_clock = NAN
+        if gpu['available']:
+            if not gpu['temp'] <= gpu_temp:
+                gpu_temp = gpu['temp']
+            gpu_power = gpu['power']
+            gpu_util = gpu['utilization']
+            gpu_throttle = 1.0 if gpu['throttle_reasons'] else 0.0
+            gpu_mem = gpu['memory_percent']
+            gpu_clock = gpu['clock_core']
+
+        disks = system['disk_usage']
+        disk_max = max(disk['percent'] for disk in disks) if disks else NAN
+
+        # Copy of the all-NaN row: one array('d') buffer, no float object per metric.
+        # Slots come from METRIC_INDEX so the schema order lives in one place
+        index = METRIC_INDEX
+        values = self.values = EMPTY_VALUES[:]
+        values[index['cpu_temp']] = cpu_temp
+        values[index['gpu_temp']] = gpu_temp
+        values[index['nvme_temp']] = nvme_temp
+        values[index['cpu_usage']] = system['cpu_usage']
+        values[index['memory_usage']] = system['memory']['percent']
+        values[index['gpu_power']] = gpu_power
+        values[index['gpu_utilization']] = gpu_util
+        values[index['disk_usage']] = disk_max
+        values[index['gpu_throttle']] = gpu_throttle
+        values[index['cpu_freq']] = system['cpu_freq']
+        values[index['load_1m']] = system['load_average']['1m']
+        values[index['memory_used_gb']] = system['memory']['used_gb']
+        values[index['gpu_memory_percent']] = gpu_mem
+        values[index['gpu_clock_core']] = gpu_clock
+        if battery['present']:
+            values[index['battery_percent']] = battery['percent']
+            values[index['battery_voltage']] = battery['voltage']
+        values[index['warning_count']] = len(self.warnings)
+        
+        if pressure:
+            for resource, kind, slot in PSI_SLOTS:
+                stall = pressure.get(resource, {}).get(kind)
+                if stall:
+                    values[slot] = stall['avg10']
+                    values[slot + 1] = stall['avg60']
+                    values[slot + 2] = stall['total']
+            values[index['psi_events']] = pressure_events
+        if energy:
+            for source, slot in ENERGY_SLOTS:
+                measured = energy.get(source)
+                if measured:
+                    values[slot] = measured['j']
+                    values[slot + 1] = measured['w']
+                    values[slot + 2] = measured['session_j']
+                    values[slot + 3] = measured['session_w']
+
+    @property
+    def timestamp(self) -> str:
+        return datetime.datetime.fromtimestamp(self.time).isoformat()
+
+    def __getitem__(self, key: str) -> float:
+        return self.values[METRIC_INDEX[key]]
+
+    def set_sampling(self, sampling: Dict):
+        """Target interval and, once measured, the actual period"""
+        self.values[METRIC_INDEX['interval']] = sampling['interval']
+        if sampling.get('period'):
+            self.values[METRIC_INDEX['sample_period']] = sampling['period']
+
+    def as_dict(self) -> Dict[str, float]:
+        """Present metrics only (NaN dropped)"""
+        return {key: value for key, value in zip(METRIC_KEYS, self.values) if value == value}
+
+class SnapshotEncoder:
+    """Every export format of a Snapshot, each compiled once from the schema"""
+
+    BINARY_MAGIC = b'LGNS'
+
+    def __init__(self, schema: Tuple = METRIC_SCHEMA, prefix: str = 'legion_'):
+        keys = [key for key, _ in schema]
+        self.csv_header = 'timestamp,' + ','.join(keys) + '\n'
+        self._csv = '%s' + ''.join(f',%.{digits}f' for _, digits in schema) + '\n'
+        self._json = '{"timestamp":"%s",' + ','.join(f'"{key}":%.{digits}f' for key, digits in schema)
+        self.record = struct.Struct('<d' + 'f' * len(schema))
+        names = ','.join(keys).encode('ascii')
+        self.binary_header = self.BINARY_MAGIC + struct.pack('<BHH', 1, self.record.size, len(names)) + names
+        self._openmetrics = ''.join(f'# TYPE {prefix}{key} gauge\n{prefix}{key} %.{digits}f\n'
+                                    for key, digits in schema) + '# EOF\n'
+
+    def csv_row(self, snap: Snapshot) -> str:
+        return self._csv % (snap.timestamp, *snap.values)
+
+    def json_line(self, snap: Snapshot) -> str:
+        # Numeric part holds no strings, so 'nan' can only be a missing metric;
+        # a fully populated tick skips the copy
+        numbers = self._json % (snap.timestamp, *snap.values)
+        if ':nan' in numbers:
+            numbers = numbers.replace(':nan', ':null')
+        if not snap.warnings and not snap.errors:
+            return numbers + ',"warnings":[],"errors":[]}\n'
+        return (f'{numbers},"warnings":{json.dumps(snap.warnings, ensure_ascii=False)},'
+                f'"errors":{json.dumps(snap.errors, ensure_ascii=False)}}}\n')
+
+    def binary(self, snap: Snapshot) -> bytes:
+        return self.record.pack(snap.time, *snap.values)
+
+    def openmetrics(self, snap: Snapshot) -> str:
+        return (self._openmetrics % tuple(snap.values)).replace(' nan\n', ' NaN\n')
+
+ENCODER = SnapshotEncoder()
+EXPORT_EXTENSIONS = {'openmetrics': 'prom'}
+
+class AdaptiveSampler:
+    """Sampling period driven by headroom to thresholds and its rate of change"""
+
+    # Headroom fraction at which a metric no longer shortens the period
+    IDLE_HEADROOM = 0.35
+    # Samples we want to take before a rising metric reaches its threshold
+    SAMPLES_TO_LIMIT = 10
+    # Only thresholds whose crossing is a hazard set the period. Utilisation (cpu, gpu, memory,
+    # disk) sits near its limit through any game or build with thermal headroom to spare, and
+    # cpu_usage includes the monitor's own collectors, so a short period would feed on itself
+    DRIVERS = ('cpu_temp', 'gpu_temp', 'nvme_temp', 'gpu_power',
+               'psi_memory_some_avg10', 'psi_io_some_avg10')
+
+    def __init__(self, thresholds: Dict[str, float], min_interval: float = 0.1,
+                 max_interval: float = 10.0, ac_interval: Optional[float] = None,
+                 window: int = 10):
+        self.thresholds = thresholds
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.ac_interval = ac_interval
+        self.history = deque(maxlen=window)
+        self.interval = self.max_interval
+        self.headroom = {}
+        self.limiting = None
+
+    def _rate(self, key: str) -> float:
+        """Rate of change per second of one metric across the history window"""
+        points = [(t, values[key]) for t, values in self.history if key in values]
+        if len(points) < 2 or points[-1][0] <= points[0][0]:
+            return 0.0
+        return (points[-1][1] - points[0][1]) / (points[-1][0] - points[0][0])
+
+    def update(self, values: Dict[str, float], on_battery: bool, now: Optional[float] = None) -> float:
+        """Record a sample and return the period until the next one"""
+        now = time.monotonic() if now is None else now
+        self.history.append((now, values))
+
+        ceiling = self.max_interval
+        if not on_battery and self.ac_interval:
+            ceiling = min(ceiling, max(self.ac_interval, self.min_interval))
+        span = ceiling - self.min_interval
+
+        interval = ceiling
+        limiting = None
+        self.headroom = {}
+        for key in self.DRIVERS:
+            threshold = self.thresholds.get(key, 0.0)
+            if key not in values or threshold <= 0:
+                continue
+            remaining = threshold - values[key]
+            headroom = max(0.0, remaining / threshold)
+            self.headroom[key] = headroom
+
+            # Less headroom -> shorter period, quadratic so idle stays cheap
+            scale = min(1.0, headroom / self.IDLE_HEADROOM)
+            candidate = self.min_interval + span * scale * scale
+
+            # Rising towards the limit: sample often enough to catch it
+            rate = self._rate(key)
+            if rate > 0 and remaining > 0:
+                candidate = min(candidate, remaining / rate / self.SAMPLES_TO_LIMIT)
+
+            if candidate < interval:
+                interval = candidate
+                limiting = key
+
+        self.interval = float(max(self.min_interval, min(ceiling, interval)))
+        self.limiting = limiting
+        return self.interval
+
+class PressureCollector:
+    """Pressure-stall information from /proc/pressure, with kernel triggers that wake the monitor"""
+
+    def __init__(self, root: str = '/proc/pressure', trigger_ms: float = 150.0,
+                 window_ms: float = 2000.0, on_event=None):
+        self.root = root
+        self.trigger_ms = trigger_ms
+        self.window_ms = window_ms
+        self.on_event = on_event
+        self.available = bool(self.read())
+        self.triggers = {}          # fd -> resource
+        self.trigger_error = None
+        self._events = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+
+    def read(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """{resource: {'some'|'full': {'avg10', 'avg60', 'avg300', 'total'}}}, empty without PSI"""
+        pressure = {}
+        for resource in PSI_RESOURCES:
+            try:
+                with open(os.path.join(self.root, resource), 'r') as f:
+                    lines = f.read().split('\n')
+            except OSError:
+                continue  # Kernel without CONFIG_PSI, or booted with psi=0
+            kinds = {}
+            for line in lines:
+                kind, _, fields = line.partition(' ')
+                if not fields:
+                    continue
+                values = {}
+                for field in fields.split():
+                    name, _, value = field.partition('=')
+                    values[name] = float(value)
+                # total is cumulative stall time in microseconds
+                values['total'] = values.get('total', 0.0) / 1e6
+                kinds[kind] = values
+            if kinds:
+                pressure[resource] = kinds
+        return pressure
+
+    def start(self) -> bool:
+        """Register 'some' triggers and watch them; False when only polling is possible"""
+        if not self.available or self.trigger_ms <= 0 or self._thread:
+            return False
+        trigger = f"some {int(self.trigger_ms * 1000)} {int(self.window_ms * 1000)}".encode() + b'\0'
+        poller = select.poll()
+        for resource in PSI_RESOURCES:
+            try:
+                fd = os.open(os.path.join(self.root, resource), os.O_RDWR | os.O_NONBLOCK)
+            except OSError as e:
+                self.trigger_error = str(e)
+                continue
+            try:
+                os.write(fd, trigger)
+            except OSError as e:
+                # EPERM without CAP_SYS_RESOURCE on older kernels, EINVAL for bad windows
+                self.trigger_error = str(e)
+                os.close(fd)
+                continue
+            poller.register(fd, select.POLLPRI)
+            self.triggers[fd] = resource
+        if not self.triggers:
+            return False
+        
+        self._running = True
+        self._thread = threading.Thread(target=self._watch, args=(poller,), daemon=True)
+        self._thread.start()
+        return True
+
+    def _watch(self, poller):
+        while self._running and self.triggers:
+            try:
+                ready = poller.poll(1000)
+            except InterruptedError:
+                continue
+            for fd, event in ready:
+                if event & (select.POLLERR | select.POLLNVAL):
+                    poller.unregister(fd)
+                    self.triggers.pop(fd, None)
+                    os.close(fd)
+                    continue
+                resource = self.triggers.get(fd)
+                with self._lock:
+                    self._events[resource] = self._events.get(resource, 0) + 1
+                if self.on_event:
+                    self.on_event()
+
+    def drain_events(self) -> Dict[str, int]:
+        """Trigger events per resource since the previous call"""
+        with self._lock:
+            events, self._events = self._events, {}
+        return events
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+            self._thread = None
+        for fd in list(self.triggers):
+            os.close(fd)
+        self.triggers.clear()
+
+def _read_sysfs(directory: str, name: str) -> Optional[str]:
+    """Stripped content of one sysfs attribute, None if missing or unreadable"""
+    try:
+        with open(os.path.join(directory, name), 'r') as f:
+            return f.read().strip()
+    except (OSError, ValueError):
+        return None
+
+class EnergyMeter:
+    """Joules per source: hardware energy counters where present, trapezoidal sums of power otherwise"""
+
+    # Longer holes between two power samples (suspend, AC plugged in) are not integrated
+    MAX_GAP = 5.0
+    # Same rule when power is read once per monitor tick, sized for --max-interval plus a slow tick
+    MAX_TICK_GAP = 60.0
+
+    def __init__(self, root: str = '/sys', rate_hz: float = 10.0,
+                 gpu_command: Optional[List[str]] = None, gpu: bool = False):
+        """gpu_command streams "timestamp, watts" lines; without a running stream and with
+        gpu=True the owner feeds one GPU power reading per tick through add_power()"""
+        self.root = root
+        self.period = 1.0 / rate_hz if rate_hz > 0 else 0.0
+        self.max_gap = self.MAX_GAP if self.period else self.MAX_TICK_GAP
+        self.gpu_command = gpu_command
+        self.gpu_error = None
+        self.batteries = sorted(glob.glob(os.path.join(root, 'class', 'power_supply', 'BAT*')))
+        self.cpu_method, self.counters = self._discover_counters()
+        self.sources = [source for source, present in
+                        zip(ENERGY_SOURCES, (self.batteries, self.counters, gpu_command or gpu)) if present]
+        self.session_start = time.time()
+        self._session = {source: [0.0, 0.0] for source in ENERGY_SOURCES}   # joules, seconds measured
+        self._interval = {source: [0.0, 0.0] for source in ENERGY_SOURCES}
+        self._last_power = {}       # source -> (time on that source's clock, watts)
+        self._last_count = {}       # counter path -> (monotonic time, microjoules)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._gpu = None
+
+    def _discover_counters(self) -> Tuple[Optional[str], List[Tuple[str, float]]]:
+        """CPU package energy counters as (path, wrap range in uJ or 0): RAPL first, then hwmon"""
+        zones = []
+        for zone in sorted(glob.glob(os.path.join(self.root, 'class', 'powercap', '*rapl:*'))):
+            # Top-level package zones only; subzones (cores, uncore) are contained in them
+            if os.path.basename(zone).count(':') != 1 or 'mmio' in zone:
+                continue
+            if not (_read_sysfs(zone, 'name') or '').startswith('package'):
+                continue
+            # energy_uj is root-only since the Platypus mitigations
+            if _read_sysfs(zone, 'energy_uj') is None:
+                continue
+            wrap = _read_sysfs(zone, 'max_energy_range_uj')
+            zones.append((os.path.join(zone, 'energy_uj'), float(wrap) if wrap else 0.0))
+        if zones:
+            return 'rapl', zones
+
+        # amd_energy style hwmon: energyN_input in uJ, labelled Esocket0 / Ecore000 ...
+        sockets = []
+        for counter in sorted(glob.glob(os.path.join(self.root, 'class', 'hwmon', 'hwmon*', 'energy*_input'))):
+            hwmon, name = os.path.split(counter)
+            label = (_read_sysfs(hwmon, name.replace('_input', '_label')) or '').lower()
+            if ('socket' in label or 'package' in label) and _read_sysfs(hwmon, name) is not None:
+                sockets.append((counter, 0.0))
+        return ('hwmon', sockets) if sockets else (None, [])
+
+    def _battery_power(self) -> Optional[float]:
+        """Watts drawn from the batteries, None unless discharging"""
+        total = None
+        for battery in self.batteries:
+            if _read_sysfs(battery, 'status') != 'Discharging':
+                continue
+            try:
+                power = _read_sysfs(battery, 'power_now')
+                if power is not None:
+                    watts = abs(float(power)) / 1e6
+                else:
+                    # Drivers without power_now: current_now uA x voltage_now uV
+                    watts = abs(float(_read_sysfs(battery, 'current_now'))) * float(_read_sysfs(battery, 'voltage_now')) / 1e12
+            except (TypeError, ValueError):
+                continue
+            total = (total or 0.0) + watts
+        return total
+
+    def battery_voltage(self) -> Optional[float]:
+        """Voltage of the first battery from power_supply, in volts"""
+        for battery in self.batteries:
+            voltage = _read_sysfs(battery, 'voltage_now')
+            if voltage:
+                return float(voltage) / 1e6
+        return None
+
+    def _add(self, source: str, joules: float, seconds: float):
+        for bucket in (self._session, self._interval):
+            bucket[source][0] += joules
+            bucket[source][1] += seconds
+
+    def _add_power(self, source: str, now: float, watts: Optional[float], max_gap: float):
+        """Trapezoid between this power sample and the previous one"""
+        if watts is None:
+            self._last_power.pop(source, None)
+            return
+        last = self._last_power.get(source)
+        self._last_power[source] = (now, watts)
+        if last and 0 < now - last[0] <= max_gap:
+            dt = now - last[0]
+            self._add(source, (last[1] + watts) / 2 * dt, dt)
+
+    def _add_counters(self, now: float):
+        """Monotonic counter deltas, unwrapping RAPL at max_energy_range_uj"""
+        joules = seconds = 0.0
+        for path, wrap in self.counters:
+            try:
+                with open(path, 'r') as f:
+                    raw = float(f.read())
+            except (OSError, ValueError):
+                continue
+            last = self._last_count.get(path)
+            self._last_count[path] = (now, raw)
+            if not last:
+                continue
+            delta = raw - last[1]
+            if delta < 0:
+                if not wrap:
+                    continue  # Counter reset (driver reload)
+                delta += wrap
+            joules += delta / 1e6
+            seconds = max(seconds, now - last[0])
+        if seconds:
+            self._add('cpu', joules, seconds)
+
+    def sample(self, now: Optional[float] = None):
+        """Read battery power and energy counters once"""
+        now = time.monotonic() if now is None else now
+        watts = self._battery_power() if self.batteries else None
+        with self._lock:
+            if self.batteries:
+                self._add_power('system', now, watts, self.max_gap)
+            if self.counters:
+                self._add_counters(now)
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            next_tick += self.period
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick = time.monotonic()  # Fell behind: don't burst to catch up
+            self._stop.wait(max(0.0, delay))
+
+    def add_power(self, source: str, watts: Optional[float], when: Optional[float] = None):
+        """External power reading (GPU once per tick when nothing streams it)"""
+        with self._lock:
+            self._add_power(source, time.time() if when is None else when, watts, self.MAX_TICK_GAP)
+
+    @property
+    def gpu_streaming(self) -> bool:
+        gpu = self._gpu
+        return gpu is not None and gpu.poll() is None
+
+    def _read_gpu(self, process):
+        """'timestamp, power.draw' lines from the persistent nvidia-smi, integrated on the
+        device timestamps so pipe buffering cannot stretch or squeeze dt"""
+        for line in process.stdout:
+            stamp, _, power = line.partition(',')
+            try:
+                when = datetime.datetime.strptime(stamp.strip(), '%Y/%m/%d %H:%M:%S.%f').timestamp()
+            except ValueError:
+                continue  # Not a sample line
+            try:
+                watts = float(power)
+            except ValueError:
+                watts = None  # [N/A] while the dGPU is powered down
+            with self._lock:
+                self._add_power('gpu', when, watts, self.MAX_GAP)
+        code = process.wait()
+        if code and not self._stop.is_set():
+            self.gpu_error = f'{self.gpu_command[0]} exited with status {code}'
+
+    def start(self):
+        """High-rate sampler thread and the streaming GPU power reader"""
+        if self._threads:
+            return
+        self._stop.clear()
+        if self.period and (self.batteries or self.counters):
+            self._threads.append(threading.Thread(target=self._run, daemon=True))
+        if self.gpu_command:
+            try:
+                self._gpu = subprocess.Popen(self.gpu_command, stdout=subprocess.PIPE,
+                                             stderr=subprocess.DEVNULL, text=True, bufsize=1)
+                self._threads.append(threading.Thread(target=self._read_gpu, args=(self._gpu,), daemon=True))
+            except OSError as e:
+                self.gpu_error = str(e)
+        for thread in self._threads:
+            thread.start()
+
+    def lap(self, now: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """{source: {'j', 'w', 'session_j', 'session_w'}} for the interval since the previous lap"""
+        self.sample(now)
+        with self._lock:
+            interval = self._interval
+            self._interval = {source: [0.0, 0.0] for source in ENERGY_SOURCES}
+            energy = {}
+            for source in ENERGY_SOURCES:
+                session_j, session_s = self._session[source]
+                if not session_s:
+                    continue
+                joules, seconds = interval[source]
+                energy[source] = {'j': joules, 'w': joules / seconds if seconds else NAN,
+                                  'session_j': session_j, 'session_w': session_j / session_s}
+        return energy
+
+    def reset_session(self):
+        with self._lock:
+            self._session = {source: [0.0, 0.0] for source in ENERGY_SOURCES}
+            self.session_start = time.time()
+
+    def stop(self):
+        self._stop.set()
+        if self._gpu:
+            self._gpu.terminate()
+            try:
+                self._gpu.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self._gpu.kill()
+            self._gpu = None
+        for thread in self._threads:
+            thread.join(timeout=2)
+        self._threads = []
+
 class EnhancedLegionMonitor:
-    def __init__(self, export_format: str = "json"):
+    def __init__(self, export_format: str = "json", interval: float = 2,
+                 adaptive: bool = False, min_interval: float = 0.1, max_interval: float = 10.0,
+                 psi_trigger_ms: float = 150.0, energy_rate_hz: float = 10.0,
+                 sysfs_root: str = '/sys'):
         self.running = True
+        self.wake = threading.Event()  # Cuts the sleep between ticks short
         self.export_format = export_format
+        self.interval = interval
         timestamp = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-        self.log_file = f"enhanced_legion_{timestamp}.{export_format}"
+        extension = EXPORT_EXTENSIONS.get(export_format, export_format)
+        self.log_file = f"enhanced_legion_{timestamp}.{extension}"
         self.alerts = []
         self.data_history = []
         
         # Legion 5 Pro specific thresholds
-        self.thresholds = {
-            'cpu_temp': 85.0,        # AMD Ryzen 7 5800H
-            'gpu_temp': 78.0,        # RTX 3070 Mobile  
-            'nvme_temp': 70.0,       # NVMe SSD
-            'cpu_usage': 90.0,
-            'memory_usage': 85.0,
-            'gpu_power': 125.0,      # RTX 3070 Mobile max
-            'gpu_utilization': 95.0,
-            'disk_usage': 90.0
-        }
+        self.thresholds = dict(DEFAULT_THRESHOLDS)
+        
+        # Optional browser dashboard, fed from the main loop
+        self.dashboard = None
+        
+        # Adaptive sampling: on AC the fixed --interval is the slowest period
+        self.sampler = None
+        if adaptive:
+            self.sampler = AdaptiveSampler(self.thresholds, min_interval, max_interval,
+                                           ac_interval=interval)
+            psutil.cpu_percent(interval=None)  # Prime the non-blocking CPU counter
+        self._last_sample = None  # monotonic time of the previous snapshot, for the measured rate
+        # Latest tick only: sensor names, disks and status strings for the screen and TXT export.
+        # History keeps Snapshots, never these dicts
+        self.details = None
+        self.sampling = None
+        
+        # Pressure stall info; trigger events end the sleep between ticks early
+        self.pressure = PressureCollector(trigger_ms=psi_trigger_ms, on_event=self.wake.set)
         
         # Hardware availability detection
         self.gpu_available = self._check_gpu_availability()
         self.temp_sensors = self._discover_temperature_sensors()
         
+        # Energy accounting; nvidia-smi streams timestamped power.draw instead of being
+        # spawned per sample. Without the stream the per-tick GPU reading is integrated.
+        gpu_command = None
+        if self.gpu_available and energy_rate_hz > 0:
+            gpu_command = ['nvidia-smi', '-i', '0', '--query-gpu=timestamp,power.draw',
+                           '--format=csv,noheader,nounits', f'--loop-ms={max(1, int(1000 / energy_rate_hz))}']
+        self.energy = EnergyMeter(sysfs_root, energy_rate_hz, gpu_command, gpu=self.gpu_available)
+        
     def _check_gpu_availability(self) -> bool:
         """Multi-method GPU availability check for Legion 5 Pro"""
         # Method 1: nvidia-smi
@@ -319,7 +964,8 @@ class EnhancedLegionMonitor:
         
         try:
             # CPU metrics
-            metrics['cpu_usage'] = psutil.cpu_percent(interval=1)
+            # Blocking 1 s window would put a floor under adaptive periods
+            metrics['cpu_usage'] = psutil.cpu_percent(interval=None if self.sampler else 1)
             
             freq_info = psutil.cpu_freq()
             if freq_info:
@@ -406,7 +1052,10 @@ class EnhancedLegionMonitor:
                     voltage_raw = float(f.read().strip())
                     battery_info['voltage'] = voltage_raw / 1000000  # Convert to volts
             except:
-                pass
+                # Other models: the pack voltage from power_supply
+                voltage = self.energy.battery_voltage()
+                if voltage:
+                    battery_info['voltage'] = voltage
                 
         except Exception as e:
             pass
@@ -443,7 +1092,8 @@ class EnhancedLegionMonitor:
             
         return errors
 
-    def check_critical_conditions(self, temperatures: List[TempReading], gpu_info: Dict, metrics: Dict) -> List[str]:
+    def check_critical_conditions(self, temperatures: List[TempReading], gpu_info: Dict, metrics: Dict,
+                                  pressure: Optional[Dict] = None) -> List[str]:
         """Enhanced critical condition checking for Legion hardware"""
         warnings = []
         
@@ -474,6 +1124,12 @@ class EnhancedLegionMonitor:
             if disk['percent'] > self.thresholds['disk_usage']:
                 warnings.append(f"💿 Диск {disk['device']}: {disk['percent']:.1f}%")
         
+        # Pressure stall warnings (some avg10: share of time tasks were stalled)
+        for resource, kinds in (pressure or {}).items():
+            stall = kinds['some']['avg10']
+            if stall > self.thresholds[f'psi_{resource}_some_avg10']:
+                warnings.append(f"⏳ Задержки {resource.upper()} (PSI): {stall:.1f}%")
+        
         return warnings
 
     def create_alert(self, level: str, component: str, message: str, value: float, threshold: float):
@@ -492,7 +1148,8 @@ class EnhancedLegionMonitor:
         if len(self.alerts) > 100:
             self.alerts = self.alerts[-50:]
 
-    def get_color_for_temp(self, temp: float, critical: float) -> str:
+    @staticmethod
+    def get_color_for_temp(temp: float, critical: float) -> str:
         """Temperature-based color coding"""
         if temp >= critical:
             return Fore.RED + Style.BRIGHT
@@ -503,7 +1160,8 @@ class EnhancedLegionMonitor:
         else:
             return Fore.GREEN
 
-    def get_color_for_usage(self, usage: float, critical: float = 90) -> str:
+    @staticmethod
+    def get_color_for_usage(usage: float, critical: float = 90) -> str:
         """Usage-based color coding"""
         if usage >= critical:
             return Fore.RED + Style.BRIGHT
@@ -512,14 +1170,19 @@ class EnhancedLegionMonitor:
         else:
             return Fore.GREEN
 
-    def analyze_system_state(self) -> Dict:
+    def analyze_system_state(self) -> Snapshot:
         """Complete system state analysis"""
         temperatures = self.get_all_temperatures()
         gpu_info = self.get_gpu_comprehensive_info()
         metrics = self.get_system_metrics()
         battery_info = self.get_battery_info()
         errors = self.get_system_errors_detailed()
-        warnings = self.check_critical_conditions(temperatures, gpu_info, metrics)
+        pressure = self.pressure.read() if self.pressure.available else {}
+        pressure_events = self.pressure.drain_events()
+        if gpu_info['status'] == 'nvidia-smi working' and not self.energy.gpu_streaming:
+            self.energy.add_power('gpu', gpu_info['power'])
+        energy = self.energy.lap()
+        warnings = self.check_critical_conditions(temperatures, gpu_info, metrics, pressure)
         
         # Create alerts for critical conditions
         for temp in temperatures:
@@ -533,23 +1196,54 @@ class EnhancedLegionMonitor:
         if gpu_info['throttle_reasons']:
             self.create_alert('CRITICAL', 'gpu', 'GPU Throttling Detected', 1, 0)
         
-        # Build state dictionary
-        state = {
-            'timestamp': datetime.datetime.now().isoformat(),
-            'temperatures': [{'name': t.name, 'temp': t.temp, 'source': t.source, 'critical': t.critical} for t in temperatures],
-            'gpu': gpu_info,
-            'system': metrics,
-            'battery': battery_info,
-            'errors': errors,
-            'warnings': warnings,
-            'alerts_today': len([a for a in self.alerts if a.timestamp.startswith(datetime.datetime.now().strftime('%Y-%m-%d'))])
-        }
+        for resource, count in pressure_events.items():
+            stall = pressure.get(resource, {}).get('some', {}).get('avg10', 0.0)
+            self.create_alert('WARNING', 'psi', f'{resource.upper()} stall spike (PSI trigger x{count})',
+                              stall, self.thresholds[f'psi_{resource}_some_avg10'])
+        
+        today = datetime.datetime.now().strftime('%Y-%m-%d')
+        snapshot = Snapshot(temperatures, gpu_info, metrics, battery_info, errors, warnings,
+                            alerts_today=sum(1 for a in self.alerts if a.timestamp.startswith(today)),
+                            pressure=pressure, pressure_events=sum(pressure_events.values()),
+                            energy=energy)
+        self.details = {'temperatures': temperatures, 'gpu': gpu_info, 'system': metrics, 'battery': battery_info}
+        on_battery = battery_info['present'] and not battery_info['charging']
+        self.sampling = self.get_sampling_info(snapshot, on_battery)
+        snapshot.set_sampling(self.sampling)
+        
+        return snapshot
+
+    def get_sampling_info(self, snapshot: Snapshot, on_battery: bool) -> Dict:
+        """Target period for the next tick and the rate actually achieved so far"""
+        # Measured between consecutive snapshots: collectors (journalctl, nvidia-smi)
+        # can make a tick take longer than the target interval
+        now = time.monotonic()
+        period = now - self._last_sample if self._last_sample is not None else None
+        self._last_sample = now
+        
+        if not self.sampler:
+            interval = float(self.interval)
+            limiting = headroom = None
+            mode = 'fixed'
+        else:
+            interval = self.sampler.update(snapshot.as_dict(), on_battery)
+            headroom = min(self.sampler.headroom.values()) if self.sampler.headroom else None
+            limiting = self.sampler.limiting
+            mode = 'adaptive'
         
-        return state
+        expected = period if period else interval
+        return {'mode': mode, 'interval': interval, 'period': period,
+                'rate_hz': 1.0 / expected if expected else 0.0,
+                'limiting': limiting, 'headroom': headroom}
+
+    def _wait_next_tick(self, started: float, interval: float):
+        """Sleep out what is left of the interval after the tick's own work"""
+        self.wake.wait(max(0.0, interval - (time.monotonic() - started)))
+        self.wake.clear()
 
     def display_status(self):
         """Enhanced Legion-branded status display"""
-        state = self.analyze_system_state()
+        snapshot = self.analyze_system_state()
         
         os.system('clear')
         
@@ -562,49 +1256,51 @@ class EnhancedLegionMonitor:
         
         # Temperature monitoring section
         print(f"{Fore.WHITE + Style.BRIGHT}┌─ ТЕМПЕРАТУРЫ ───────────────────────────────────────────────────────┐{Style.RESET_ALL}")
-        for temp_info in state['temperatures']:
-            if 'CPU' in temp_info['name']:
-                color = self.get_color_for_temp(temp_info['temp'], self.thresholds['cpu_temp'])
+        details = self.details
+        for temp_info in details['temperatures']:
+            if 'CPU' in temp_info.name:
+                color = self.get_color_for_temp(temp_info.temp, self.thresholds['cpu_temp'])
                 icon = "🔥"
-            elif 'GPU' in temp_info['name']:
-                color = self.get_color_for_temp(temp_info['temp'], self.thresholds['gpu_temp'])
+            elif 'GPU' in temp_info.name:
+                color = self.get_color_for_temp(temp_info.temp, self.thresholds['gpu_temp'])
                 icon = "🎮"
-            elif 'NVMe' in temp_info['name']:
-                color = self.get_color_for_temp(temp_info['temp'], self.thresholds['nvme_temp'])
+            elif 'NVMe' in temp_info.name:
+                color = self.get_color_for_temp(temp_info.temp, self.thresholds['nvme_temp'])
                 icon = "💾"
             else:
-                color = self.get_color_for_temp(temp_info['temp'], 80)
+                color = self.get_color_for_temp(temp_info.temp, 80)
                 icon = "🌡️"
             
-            critical_text = f"/{temp_info['critical']:.0f}°C" if temp_info['critical'] else ""
-            print(f"│ {icon} {temp_info['name']:<20}: {color}{temp_info['temp']:5.1f}°C{critical_text}{Style.RESET_ALL} " +
-                  f"({temp_info['source']}) │")
+            critical_text = f"/{temp_info.critical:.0f}°C" if temp_info.critical else ""
+            print(f"│ {icon} {temp_info.name:<20}: {color}{temp_info.temp:5.1f}°C{critical_text}{Style.RESET_ALL} " +
+                  f"({temp_info.source}) │")
         print(f"{Fore.WHITE + Style.BRIGHT}└──────────────────────────────────────────────────────────────────────┘{Style.RESET_ALL}")
         
         # GPU section with enhanced status reporting
-        if state['gpu']['available']:
+        gpu = details['gpu']
+        if gpu['available']:
             print(f"\n{Fore.WHITE + Style.BRIGHT}┌─ ВИДЕОКАРТА (RTX 3070 Mobile) ──────────────────────────────────────┐{Style.RESET_ALL}")
             
-            if state['gpu']['status'] != 'nvidia-smi working':
+            if gpu['status'] != 'nvidia-smi working':
                 # GPU found but nvidia-smi issues
                 status_color = Fore.YELLOW
-                print(f"│ Статус: {status_color}{state['gpu']['status']:<50}{Style.RESET_ALL} │")
-                print(f"│ Драйвер: {Fore.CYAN}{state['gpu']['driver_version']:<45}{Style.RESET_ALL} │")
+                print(f"│ Статус: {status_color}{gpu['status']:<50}{Style.RESET_ALL} │")
+                print(f"│ Драйвер: {Fore.CYAN}{gpu['driver_version']:<45}{Style.RESET_ALL} │")
                 print(f"│ {Fore.YELLOW}💡 Решение: sudo reboot или переустановка драйверов{Style.RESET_ALL}           │")
             else:
                 # GPU working normally
-                gpu_temp_color = self.get_color_for_temp(state['gpu']['temp'], self.thresholds['gpu_temp'])
-                power_color = self.get_color_for_usage(state['gpu']['power'], self.thresholds['gpu_power'])
-                util_color = self.get_color_for_usage(state['gpu']['utilization'])
+                gpu_temp_color = self.get_color_for_temp(snapshot['gpu_temp'], self.thresholds['gpu_temp'])
+                power_color = self.get_color_for_usage(snapshot['gpu_power'], self.thresholds['gpu_power'])
+                util_color = self.get_color_for_usage(snapshot['gpu_utilization'])
                 
-                print(f"│ Температура: {gpu_temp_color}{state['gpu']['temp']:5.1f}°C{Style.RESET_ALL}  │  " +
-                      f"Мощность: {power_color}{state['gpu']['power']:5.1f}W{Style.RESET_ALL}  │  " +
-                      f"Загрузка: {util_color}{state['gpu']['utilization']:4.1f}%{Style.RESET_ALL}  │")
+                print(f"│ Температура: {gpu_temp_color}{snapshot['gpu_temp']:5.1f}°C{Style.RESET_ALL}  │  " +
+                      f"Мощность: {power_color}{snapshot['gpu_power']:5.1f}W{Style.RESET_ALL}  │  " +
+                      f"Загрузка: {util_color}{snapshot['gpu_utilization']:4.1f}%{Style.RESET_ALL}  │")
                 
-                print(f"│ VRAM: {state['gpu']['memory_used']/1024:4.1f}GB/{state['gpu']['memory_total']/1024:4.1f}GB " +
-                      f"({state['gpu']['memory_percent']:4.1f}%)  │  Частота: {Fore.GREEN}{state['gpu']['clock_core']:4.0f}MHz{Style.RESET_ALL}      │")
+                print(f"│ VRAM: {gpu['memory_used']/1024:4.1f}GB/{gpu['memory_total']/1024:4.1f}GB " +
+                      f"({snapshot['gpu_memory_percent']:4.1f}%)  │  Частота: {Fore.GREEN}{snapshot['gpu_clock_core']:4.0f}MHz{Style.RESET_ALL}      │")
                 
-                if state['gpu']['throttle_reasons']:
+                if snapshot['gpu_throttle']:
                     print(f"│ {Fore.RED + Style.BRIGHT}🚨 THROTTLING АКТИВЕН!{Style.RESET_ALL}                                          │")
             
             print(f"{Fore.WHITE + Style.BRIGHT}└──────────────────────────────────────────────────────────────────────┘{Style.RESET_ALL}")
@@ -615,46 +1311,75 @@ class EnhancedLegionMonitor:
         
         # System metrics section
         print(f"\n{Fore.WHITE + Style.BRIGHT}┌─ СИСТЕМА ───────────────────────────────────────────────────────────┐{Style.RESET_ALL}")
-        cpu_color = self.get_color_for_usage(state['system']['cpu_usage'])
-        mem_color = self.get_color_for_usage(state['system']['memory']['percent'])
+        system = details['system']
+        cpu_color = self.get_color_for_usage(snapshot['cpu_usage'])
+        mem_color = self.get_color_for_usage(snapshot['memory_usage'])
         
-        print(f"│ CPU: {cpu_color}{state['system']['cpu_usage']:5.1f}%{Style.RESET_ALL}  │  " +
-              f"Частота: {Fore.CYAN}{state['system']['cpu_freq']:4.0f}MHz{Style.RESET_ALL}  │  " +
-              f"RAM: {mem_color}{state['system']['memory']['percent']:4.1f}%{Style.RESET_ALL}        │")
+        print(f"│ CPU: {cpu_color}{snapshot['cpu_usage']:5.1f}%{Style.RESET_ALL}  │  " +
+              f"Частота: {Fore.CYAN}{snapshot['cpu_freq']:4.0f}MHz{Style.RESET_ALL}  │  " +
+              f"RAM: {mem_color}{snapshot['memory_usage']:4.1f}%{Style.RESET_ALL}        │")
         
-        print(f"│ Память: {state['system']['memory']['used_gb']:4.1f}GB/{state['system']['memory']['total_gb']:4.1f}GB  │  " +
-              f"Load: {Fore.YELLOW}{state['system']['load_average']['1m']:4.2f}{Style.RESET_ALL}  │  " +
-              f"Время: {Fore.GREEN}{state['system']['uptime_hours']:4.1f}h{Style.RESET_ALL}    │")
+        print(f"│ Память: {snapshot['memory_used_gb']:4.1f}GB/{system['memory']['total_gb']:4.1f}GB  │  " +
+              f"Load: {Fore.YELLOW}{snapshot['load_1m']:4.2f}{Style.RESET_ALL}  │  " +
+              f"Время: {Fore.GREEN}{system['uptime_hours']:4.1f}h{Style.RESET_ALL}    │")
         
         # Battery information
-        if state['battery']['present']:
-            battery_color = Fore.GREEN if state['battery']['charging'] else Fore.YELLOW
-            print(f"│ Питание: {battery_color}{state['battery']['power_source']}{Style.RESET_ALL}  │  " +
-                  f"Батарея: {battery_color}{state['battery']['percent']:3.0f}%{Style.RESET_ALL}  │  " +
-                  f"Напряжение: {Fore.CYAN}{state['battery']['voltage']:.2f}V{Style.RESET_ALL}    │")
+        battery = details['battery']
+        if battery['present']:
+            battery_color = Fore.GREEN if battery['charging'] else Fore.YELLOW
+            print(f"│ Питание: {battery_color}{battery['power_source']}{Style.RESET_ALL}  │  " +
+                  f"Батарея: {battery_color}{snapshot['battery_percent']:3.0f}%{Style.RESET_ALL}  │  " +
+                  f"Напряжение: {Fore.CYAN}{snapshot['battery_voltage']:.2f}V{Style.RESET_ALL}    │")
+        
+        # Pressure stall information (some avg10 / full avg10)
+        cells = []
+        for resource in PSI_RESOURCES:
+            some = snapshot[f'psi_{resource}_some_avg10']
+            if some != some:
+                continue
+            full = snapshot[f'psi_{resource}_full_avg10']
+            full = full if full == full else 0.0  # No 'full' line for cpu on older kernels
+            color = self.get_color_for_usage(some, self.thresholds[f'psi_{resource}_some_avg10'])
+            cells.append(f"{resource.upper()}: {color}{some:4.1f}%{Style.RESET_ALL}/{full:4.1f}%")
+        if cells:
+            triggers = f"{Fore.GREEN}triggers{Style.RESET_ALL}" if self.pressure.triggers else "poll"
+            print(f"│ PSI {'  │  '.join(cells)}  │  {triggers}    │")
+        
+        # Energy: average watts this interval / session total
+        names = {'system': 'Система', 'cpu': 'CPU', 'gpu': 'GPU'}
+        cells = []
+        for source, slot in ENERGY_SLOTS:
+            watts, session_j = snapshot.values[slot + 1], snapshot.values[slot + 2]
+            if session_j != session_j:
+                continue
+            watts = f"{watts:5.1f}W" if watts == watts else "    -"
+            cells.append(f"{names[source]}: {Fore.CYAN}{watts}{Style.RESET_ALL}/{session_j / 3600:.2f}Wh")
+        if cells:
+            session = datetime.timedelta(seconds=int(snapshot.time - self.energy.session_start))
+            print(f"│ Энергия {'  │  '.join(cells)}  │  {session} ({Fore.GREEN}e{Style.RESET_ALL} - сброс)  │")
         
         print(f"{Fore.WHITE + Style.BRIGHT}└──────────────────────────────────────────────────────────────────────┘{Style.RESET_ALL}")
         
         # Disk usage (filtered)
-        if state['system']['disk_usage']:
+        if system['disk_usage']:
             print(f"\n{Fore.WHITE + Style.BRIGHT}┌─ ДИСКИ ─────────────────────────────────────────────────────────────┐{Style.RESET_ALL}")
-            for disk in state['system']['disk_usage'][:3]:  # Show first 3 disks
+            for disk in system['disk_usage'][:3]:  # Show first 3 disks
                 disk_color = self.get_color_for_usage(disk['percent'], self.thresholds['disk_usage'])
                 print(f"│ {disk['device']:<15}: {disk_color}{disk['percent']:5.1f}%{Style.RESET_ALL} " +
                       f"({disk['used_gb']:4.1f}GB/{disk['total_gb']:4.1f}GB) {disk['mountpoint']:<10} │")
             print(f"{Fore.WHITE + Style.BRIGHT}└──────────────────────────────────────────────────────────────────────┘{Style.RESET_ALL}")
         
         # Warnings section
-        if state['warnings']:
+        if snapshot.warnings:
             print(f"\n{Fore.RED + Style.BRIGHT}┌─ ПРЕДУПРЕЖДЕНИЯ ────────────────────────────────────────────────────┐{Style.RESET_ALL}")
-            for warning in state['warnings'][:5]:  # Show max 5 warnings
+            for warning in snapshot.warnings[:5]:  # Show max 5 warnings
                 print(f"│ {Fore.RED}{warning:<70}{Style.RESET_ALL} │")
             print(f"{Fore.RED + Style.BRIGHT}└──────────────────────────────────────────────────────────────────────┘{Style.RESET_ALL}")
         
         # Recent system errors
-        if state['errors']:
+        if snapshot.errors:
             print(f"\n{Fore.YELLOW + Style.BRIGHT}┌─ СИСТЕМНЫЕ ОШИБКИ ──────────────────────────────────────────────────┐{Style.RESET_ALL}")
-            for error in state['errors'][:3]:  # Show max 3 recent errors
+            for error in snapshot.errors[:3]:  # Show max 3 recent errors
                 error_msg = error['message'][:60] + "..." if len(error['message']) > 60 else error['message']
                 print(f"│ {Fore.YELLOW}{error_msg:<70}{Style.RESET_ALL} │")
             print(f"{Fore.YELLOW + Style.BRIGHT}└──────────────────────────────────────────────────────────────────────┘{Style.RESET_ALL}")
@@ -662,51 +1387,69 @@ class EnhancedLegionMonitor:
         # Control panel
         print(f"\n{Fore.WHITE + Style.BRIGHT}┌─ УПРАВЛЕНИЕ ────────────────────────────────────────────────────────┐{Style.RESET_ALL}")
         print(f"│ {Fore.GREEN}q{Style.RESET_ALL} - Выход  │  {Fore.GREEN}s{Style.RESET_ALL} - Сохранить  │  " +
-              f"{Fore.GREEN}r{Style.RESET_ALL} - Сброс  │  Alerts: {Fore.YELLOW}{state['alerts_today']}{Style.RESET_ALL}        │")
+              f"{Fore.GREEN}r{Style.RESET_ALL} - Сброс  │  Alerts: {Fore.YELLOW}{snapshot.alerts_today}{Style.RESET_ALL}        │")
+        sampling = self.sampling
+        limiting_text = f" ({sampling['limiting']})" if sampling['limiting'] else ""
+        # Measured rate turns yellow when the tick itself cannot keep up with the target
+        rate_color = Fore.YELLOW if sampling['period'] and sampling['period'] > sampling['interval'] * 1.2 else Fore.GREEN
+        print(f"│ Интервал: {Fore.CYAN}{sampling['interval']:5.2f}s{Style.RESET_ALL} " +
+              f"(факт {rate_color}{sampling['rate_hz']:4.1f} Гц{Style.RESET_ALL}, {sampling['mode']}{limiting_text})" + " " * 14 + "│")
         print(f"│ Лог: {Fore.CYAN}{self.log_file:<60}{Style.RESET_ALL} │")
+        if self.dashboard:
+            host, port = self.dashboard.address[:2]
+            print(f"│ Web: {Fore.CYAN}{f'http://{host}:{port}/':<60}{Style.RESET_ALL} │")
         print(f"{Fore.WHITE + Style.BRIGHT}└──────────────────────────────────────────────────────────────────────┘{Style.RESET_ALL}")
         
-        return state
+        return snapshot
 
-    def export_data(self, data: Dict):
+    def export_data(self, snapshot: Snapshot):
         """Export system data in specified format"""
         try:
             if self.export_format == 'json':
                 with open(self.log_file, 'a', encoding='utf-8') as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                    f.write('\n')
+                    f.write(ENCODER.json_line(snapshot))
             elif self.export_format == 'csv':
-                # CSV export with key metrics
-                csv_line = f"{data['timestamp']},{data['system']['cpu_usage']:.1f},{data['system']['memory']['percent']:.1f}"
-                if data['gpu']['available']:
-                    csv_line += f",{data['gpu']['temp']:.1f},{data['gpu']['power']:.1f}"
-                else:
-                    csv_line += ",0,0"
-                
-                # Add temperature data
-                for temp in data['temperatures']:
-                    csv_line += f",{temp['temp']:.1f}"
-                
-                csv_line += f",{len(data['warnings'])}\n"
-                
                 with open(self.log_file, 'a', encoding='utf-8') as f:
-                    f.write(csv_line)
+                    if f.tell() == 0:
+                        f.write(ENCODER.csv_header)
+                    f.write(ENCODER.csv_row(snapshot))
+            elif self.export_format == 'bin':
+                with open(self.log_file, 'ab') as f:
+                    if f.tell() == 0:
+                        f.write(ENCODER.binary_header)
+                    f.write(ENCODER.binary(snapshot))
+            elif self.export_format == 'openmetrics':
+                # Textfile-collector style: replace the exposition atomically every tick
+                tmp_file = self.log_file + '.tmp'
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    f.write(ENCODER.openmetrics(snapshot))
+                os.replace(tmp_file, self.log_file)
             else:  # txt format
                 with open(self.log_file, 'a', encoding='utf-8') as f:
-                    f.write(f"[{data['timestamp']}] ")
+                    f.write(f"[{snapshot.timestamp}] ")
                     
                     # Temperature summary
-                    for temp in data['temperatures']:
-                        f.write(f"{temp['name']}: {temp['temp']:.1f}°C | ")
+                    for temp in self.details['temperatures']:
+                        f.write(f"{temp.name}: {temp.temp:.1f}°C | ")
                     
                     # GPU and system summary
-                    if data['gpu']['available']:
-                        f.write(f"GPU: {data['gpu']['temp']:.1f}°C/{data['gpu']['power']:.1f}W | ")
-                    f.write(f"CPU: {data['system']['cpu_usage']:.1f}% | ")
-                    f.write(f"RAM: {data['system']['memory']['percent']:.1f}%\n")
+                    if snapshot['gpu_power'] == snapshot['gpu_power']:
+                        f.write(f"GPU: {snapshot['gpu_temp']:.1f}°C/{snapshot['gpu_power']:.1f}W | ")
+                    f.write(f"CPU: {snapshot['cpu_usage']:.1f}% | ")
+                    f.write(f"RAM: {snapshot['memory_usage']:.1f}% | ")
+                    values = snapshot.values
+                    stalls = " ".join(f"{resource} {values[slot]:.1f}%" for resource, kind, slot in PSI_SLOTS
+                                      if kind == 'some' and values[slot] == values[slot])
+                    if stalls:
+                        f.write(f"PSI: {stalls} | ")
+                    energy = " ".join(f"{source} {values[slot + 1]:.1f}W/{values[slot + 2] / 1000:.1f}kJ"
+                                      for source, slot in ENERGY_SLOTS if values[slot + 2] == values[slot + 2])
+                    if energy:
+                        f.write(f"Energy: {energy} | ")
+                    f.write(f"Interval: {snapshot['interval']:.2f}s ({self.sampling['rate_hz']:.2f} Hz)\n")
                     
                     # Warnings
-                    for warning in data['warnings']:
+                    for warning in snapshot.warnings:
                         f.write(f"  WARNING: {warning}\n")
                     f.write("\n")
                     
@@ -720,6 +1463,7 @@ class EnhancedLegionMonitor:
                 key = input().strip().lower()
                 if key == 'q':
                     self.running = False
+                    self.wake.set()
                     break
                 elif key == 's':
                     print(f"\n{Fore.GREEN}✓ Data saved to {self.log_file}{Style.RESET_ALL}")
@@ -728,15 +1472,32 @@ class EnhancedLegionMonitor:
                     self.alerts = []
                     print(f"\n{Fore.GREEN}✓ Alerts reset{Style.RESET_ALL}")
                     time.sleep(1)
+                elif key == 'e':
+                    self.energy.reset_session()
+                    print(f"\n{Fore.GREEN}✓ Energy session restarted{Style.RESET_ALL}")
+                    time.sleep(1)
             except (EOFError, KeyboardInterrupt):
                 self.running = False
+                self.wake.set()
                 break
 
-    def run(self, interval: int = 2):
+    def run(self, interval: Optional[float] = None):
         """Main monitoring loop with enhanced Legion-specific features"""
+        if interval is not None:
+            self.interval = interval
+            if self.sampler:
+                self.sampler.ac_interval = interval
         print(f"{Fore.GREEN}🚀 Starting Enhanced Legion 5 Pro Monitor...{Style.RESET_ALL}")
         print(f"{Fore.CYAN}Temperature sensors: {len(self.temp_sensors)} discovered{Style.RESET_ALL}")
         print(f"{Fore.CYAN}GPU: {'Available' if self.gpu_available else 'Not available'}{Style.RESET_ALL}")
+        if self.sampler:
+            print(f"{Fore.CYAN}Adaptive sampling: {self.sampler.min_interval:g}-{self.sampler.max_interval:g}s{Style.RESET_ALL}")
+        if self.dashboard:
+            self.dashboard.start()
+            host, port = self.dashboard.address[:2]
+            print(f"{Fore.CYAN}Dashboard: http://{host}:{port}/{Style.RESET_ALL}")
+        self._start_pressure_triggers()
+        self._start_energy()
         time.sleep(3)
         
         # Start input handler thread
@@ -745,33 +1506,1448 @@ class EnhancedLegionMonitor:
         
         try:
             while self.running:
-                state = self.display_status()
-                self.export_data(state)
-                self.data_history.append(state)
+                started = time.monotonic()
+                snapshot = self.display_status()
+                self.export_data(snapshot)
+                self.data_history.append(snapshot)
                 
                 # Limit history to prevent memory issues
                 if len(self.data_history) > 300:
                     self.data_history = self.data_history[-200:]
                 
-                time.sleep(interval)
+                if self.dashboard:
+                    self.dashboard.publish(snapshot)
+                
+                self._wait_next_tick(started, snapshot['interval'])
                 
         except KeyboardInterrupt:
             pass
         finally:
+            self.pressure.stop()
+            self.energy.stop()
+            if self.dashboard:
+                self.dashboard.stop()
             print(f"\n\n{Fore.GREEN}✅ Enhanced Legion Monitor stopped. Data saved to {self.log_file}{Style.RESET_ALL}")
 
+    def _start_pressure_triggers(self):
+        if not self.pressure.available:
+            print(f"{Fore.YELLOW}PSI: not available (kernel without /proc/pressure){Style.RESET_ALL}")
+        elif self.pressure.start():
+            print(f"{Fore.CYAN}PSI: kernel triggers armed ({self.pressure.trigger_ms:g}ms stall per " +
+                  f"{self.pressure.window_ms / 1000:g}s){Style.RESET_ALL}")
+        else:
+            reason = self.pressure.trigger_error or 'disabled'
+            print(f"{Fore.YELLOW}PSI: polling every tick, triggers unavailable ({reason}){Style.RESET_ALL}")
+
+    def _start_energy(self):
+        if not self.energy.sources:
+            print(f"{Fore.YELLOW}Energy: no battery, RAPL/hwmon counter or GPU power source{Style.RESET_ALL}")
+            return
+        self.energy.start()
+        methods = {'system': 'battery', 'cpu': self.energy.cpu_method,
+                   'gpu': 'nvidia-smi stream' if self.energy.gpu_streaming else 'per tick'}
+        rate = f"at {1 / self.energy.period:g} Hz" if self.energy.period else "once per tick"
+        print(f"{Fore.CYAN}Energy: " + ", ".join(f"{source} ({methods[source]})" for source in self.energy.sources) +
+              f", sampled {rate}{Style.RESET_ALL}")
+        if self.energy.gpu_error:
+            print(f"{Fore.YELLOW}Energy: GPU power stream unavailable ({self.energy.gpu_error}), "
+                  f"integrating the per-tick reading{Style.RESET_ALL}")
+
+    def run_agent(self, agent: 'FleetAgent'):
+        """Headless loop streaming samples to a fleet aggregator"""
+        host, port = agent.address
+        print(f"{Fore.GREEN}🛰️  Fleet agent {agent.hostname.decode()} -> {host}:{port} ({agent.proto.upper()}){Style.RESET_ALL}")
+        self._start_pressure_triggers()
+        self._start_energy()
+        try:
+            while self.running:
+                started = time.monotonic()
+                snapshot = self.analyze_system_state()
+                self.export_data(snapshot)
+                agent.submit(snapshot.values, snapshot.time)
+                self._wait_next_tick(started, snapshot['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.pressure.stop()
+            self.energy.stop()
+            agent.close()
+            print(f"\n{Fore.GREEN}✅ Fleet agent stopped: {agent.sent} packets sent, {agent.dropped} dropped{Style.RESET_ALL}")
+
+# Offline log analysis: record framing per export format
+LOG_RECORD_MARKERS = {'json': b'{', 'txt': b'[', 'csv': b''}
+HISTOGRAM_BINS = {'cpu_temp': 5.0, 'gpu_temp': 5.0, 'nvme_temp': 5.0, 'gpu_power': 10.0}
+WINDOW_METRICS = ('cpu_temp', 'gpu_temp', 'nvme_temp', 'gpu_power')
+MAX_SAMPLE_GAP = 60.0  # Longer gaps are pauses, not time spent in a state
+
+def _detect_log_format(path: str) -> str:
+    """Export format of a log file, by extension or first byte"""
+    ext = os.path.splitext(path)[1].lstrip('.').lower()
+    if ext in LOG_RECORD_MARKERS:
+        return ext
+    with open(path, 'rb') as f:
+        first = f.read(1)
+    return 'json' if first == b'{' else 'txt' if first == b'[' else 'csv'
+
+def _iter_log_records(path: str, start: int, end: int, marker: bytes,
+                      warmup: int = 0, block_size: int = 8 << 20):
+    """Yield (owned, record) for records starting in [start - warmup, end)
+
+    A record begins with `marker` at the start of a line and runs up to the
+    next one, so only one block plus one record is held in memory.
+    """
+    sep = b'\n' + marker
+    pos = max(0, start - warmup)
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        # Start one byte early so a record beginning exactly at pos is seen
+        base = max(0, pos - 1)
+        f.seek(base)
+        buf = f.read(block_size)
+        cur = 0 if pos == 0 and buf.startswith(marker) else -1
+        
+        while True:
+            eof = base + len(buf) >= size
+            if cur < 0:
+                idx = buf.find(sep)
+                if idx >= 0:
+                    cur = idx + 1
+                elif eof:
+                    return
+                else:
+                    keep = len(sep) - 1
+                    base += len(buf) - keep
+                    buf = buf[len(buf) - keep:] + f.read(block_size)
+                    continue
+            if base + cur >= end:
+                return
+            nxt = buf.find(sep, cur)
+            if nxt < 0:
+                if eof:
+                    if buf[cur:].strip():
+                        yield base + cur >= start, buf[cur:]
+                    return
+                base += cur
+                buf = buf[cur:] + f.read(block_size)
+                cur = 0
+                continue
+            yield base + cur >= start, buf[cur:nxt]
+            cur = nxt + 1
+
+def _parse_timestamp(value: str) -> Optional[float]:
+    try:
+        return datetime.datetime.fromisoformat(value).timestamp()
+    except (ValueError, TypeError):
+        return None
+
+def _parse_json_record(record: bytes, header) -> Optional[Tuple]:
+    """(timestamp, hour, values, errors) from one JSON export record"""
+    data = json.loads(record)
+    ts = _parse_timestamp(data.get('timestamp'))
+    if ts is None:
+        return None
+    if 'temperatures' in data:
+        values = flatten_state(data)  # Pre-snapshot pretty-printed state dict
+    else:
+        values = {key: data[key] for key in METRIC_KEYS if data.get(key) is not None}
+    return ts, data['timestamp'][:13], values, data.get('errors') or []
+
+def _parse_csv_record(record: bytes, header) -> Optional[Tuple]:
+    """(timestamp, hour, values, errors) from one CSV export row"""
+    fields = record.decode('utf-8', 'replace').strip().split(',')
+    if fields[0] == 'timestamp':
+        return None
+    ts = _parse_timestamp(fields[0])
+    if ts is None or len(fields) < 5:
+        return None
+    if header and header[1] == METRIC_KEYS[0]:
+        # Schema layout: columns named after METRIC_KEYS, 'nan' when missing
+        values = {key: float(value) for key, value in zip(header[1:], fields[1:])
+                  if key in METRIC_INDEX and value != 'nan'}
+        return ts, fields[0][:13], values, []
+    values = {'cpu_usage': float(fields[1]), 'memory_usage': float(fields[2])}
+    if float(fields[3]) or float(fields[4]):
+        values['gpu_temp'] = float(fields[3])
+        values['gpu_power'] = float(fields[4])
+    # Legacy headerless rows: temperature columns are anonymous
+    if header and len(header) == len(fields):
+        for name, value in zip(header[5:], fields[5:]):
+            key = _classify_temp(name)
+            if key:
+                values[key] = max(values.get(key, float(value)), float(value))
+    return ts, fields[0][:13], values, []
+
+def _parse_txt_record(record: bytes, header) -> Optional[Tuple]:
+    """(timestamp, hour, values, errors) from one TXT export block"""
+    lines = record.decode('utf-8', 'replace').split('\n')
+    stamp, _, rest = lines[0].partition('] ')
+    ts = _parse_timestamp(stamp.lstrip('['))
+    if ts is None:
+        return None
+    values = {}
+    for part in rest.split(' | '):
+        name, _, value = part.partition(': ')
+        if name == 'GPU' and '/' in value:
+            temp, power = value.split('/', 1)
+            values['gpu_temp'] = float(temp.rstrip('°C'))
+            values['gpu_power'] = float(power.rstrip('W'))
+        elif name == 'CPU' and value.endswith('%'):
+            values['cpu_usage'] = float(value[:-1])
+        elif name == 'RAM' and value.endswith('%'):
+            values['memory_usage'] = float(value[:-1])
+        elif value.endswith('°C'):
+            key = _classify_temp(name)
+            if key:
+                temp = float(value[:-2])
+                values[key] = max(values.get(key, temp), temp)
+    if any('THROTTLING' in line for line in lines[1:]):
+        values['gpu_throttle'] = 1.0
+    elif 'gpu_temp' in values:
+        values['gpu_throttle'] = 0.0
+    return ts, stamp.lstrip('[')[:13], values, []
+
+LOG_PARSERS = {'json': _parse_json_record, 'csv': _parse_csv_record, 'txt': _parse_txt_record}
+
+class LogAggregate:
+    """Mergeable statistics for one contiguous slice of one log file"""
+
+    def __init__(self, file_index: int, thresholds: Dict[str, float], window: float):
+        self.file_index = file_index
+        self.thresholds = thresholds
+        self.window = window
+        self.bytes = 0
+        self.records = 0
+        self.bad_records = 0
+        self.stats = {}           # metric -> [count, sum, min, max]
+        self.histograms = {}      # metric -> {bin_start: count}
+        self.time_above = {}      # metric -> seconds
+        self.observed = 0.0       # seconds covered by consecutive samples
+        self.throttle_events = {}  # 'YYYY-MM-DDTHH' -> rising edges
+        self.error_windows = {}   # (realtime_us, message) -> window summary
+        self.head = None          # (ts, hour, throttled) of first owned sample
+        self.tail = None          # (ts, above metrics, throttled) of last owned sample
+        self._recent = deque()
+
+    def add(self, owned: bool, ts: float, hour: str, values: Dict[str, float], errors: List[Dict]):
+        self._recent.append((ts, values))
+        while self._recent[0][0] < ts - 2 * self.window:
+            self._recent.popleft()
+        if not owned:
+            return
+        
+        self.records += 1
+        for key, value in values.items():
+            stat = self.stats.get(key)
+            if stat is None:
+                self.stats[key] = [1, value, value, value]
+            else:
+                stat[0] += 1
+                stat[1] += value
+                if value < stat[2]:
+                    stat[2] = value
+                if value > stat[3]:
+                    stat[3] = value
+            width = HISTOGRAM_BINS.get(key)
+            if width:
+                hist = self.histograms.setdefault(key, {})
+                bucket = int(value // width * width)
+                hist[bucket] = hist.get(bucket, 0) + 1
+        
+        throttled = values.get('gpu_throttle', 0.0) > 0
+        above = tuple(k for k, limit in self.thresholds.items() if values.get(k, 0) > limit)
+        if self.tail is None:
+            self.head = (ts, hour, throttled)
+            if throttled:
+                self.throttle_events[hour] = self.throttle_events.get(hour, 0) + 1
+        else:
+            self._account_gap(self.tail, ts)
+            if throttled and not self.tail[2]:
+                self.throttle_events[hour] = self.throttle_events.get(hour, 0) + 1
+        self.tail = (ts, above, throttled)
+        
+        for error in errors:
+            self._add_error(error)
+
+    def _account_gap(self, tail: Tuple, ts: float):
+        gap = min(ts - tail[0], MAX_SAMPLE_GAP)
+        if gap <= 0:
+            return
+        self.observed += gap
+        for key in tail[1]:
+            self.time_above[key] = self.time_above.get(key, 0.0) + gap
+
+    def _add_error(self, error: Dict):
+        try:
+            realtime = int(error.get('timestamp') or 0)
+        except ValueError:
+            return
+        key = (realtime, error.get('message', '')[:200])
+        if not realtime or key in self.error_windows:
+            return
+        error_ts = realtime / 1e6
+        samples = [v for t, v in self._recent if error_ts - self.window <= t <= error_ts]
+        summary = {
+            'time': datetime.datetime.fromtimestamp(error_ts).isoformat(),
+            'message': key[1],
+            'unit': error.get('unit', 'unknown'),
+            'samples': len(samples),
+            'covered': bool(self._recent) and self._recent[0][0] <= error_ts - self.window,
+            'throttled': any(v.get('gpu_throttle', 0) > 0 for v in samples)
+        }
+        for metric in WINDOW_METRICS:
+            series = [v[metric] for v in samples if metric in v]
+            if series:
+                summary[metric] = {'max': max(series), 'mean': sum(series) / len(series)}
+        self.error_windows[key] = summary
+
+    def merge(self, other: 'LogAggregate'):
+        """Fold in the aggregate of the slice that directly follows this one"""
+        same_file = other.file_index == self.file_index
+        if same_file and self.tail and other.head:
+            self._account_gap(self.tail, other.head[0])
+            # The follower counted a rising edge it could not see the start of
+            if self.tail[2] and other.head[2]:
+                other.throttle_events[other.head[1]] -= 1
+        
+        self.bytes += other.bytes
+        self.records += other.records
+        self.bad_records += other.bad_records
+        self.observed += other.observed
+        for key, stat in other.stats.items():
+            mine = self.stats.get(key)
+            if mine is None:
+                self.stats[key] = list(stat)
+            else:
+                mine[0] += stat[0]
+                mine[1] += stat[1]
+                mine[2] = min(mine[2], stat[2])
+                mine[3] = max(mine[3], stat[3])
+        for key, hist in other.histograms.items():
+            mine = self.histograms.setdefault(key, {})
+            for bucket, count in hist.items():
+                mine[bucket] = mine.get(bucket, 0) + count
+        for key, seconds in other.time_above.items():
+            self.time_above[key] = self.time_above.get(key, 0.0) + seconds
+        for hour, count in other.throttle_events.items():
+            self.throttle_events[hour] = self.throttle_events.get(hour, 0) + count
+        for key, summary in other.error_windows.items():
+            self.error_windows.setdefault(key, summary)
+        
+        if other.head:
+            self.head = self.head or other.head
+            self.tail = other.tail
+        elif not same_file:
+            self.tail = None
+        self.file_index = other.file_index
+
+    def report(self) -> Dict:
+        metrics = {}
+        for key, (count, total, low, high) in sorted(self.stats.items()):
+            metrics[key] = {'samples': count, 'min': low, 'mean': total / count, 'max': high}
+            if key in self.thresholds:
+                seconds = self.time_above.get(key, 0.0)
+                metrics[key]['threshold'] = self.thresholds[key]
+                metrics[key]['seconds_above'] = seconds
+                metrics[key]['percent_above'] = seconds / self.observed * 100 if self.observed else 0.0
+        return {
+            'records': self.records,
+            'bad_records': self.bad_records,
+            'observed_seconds': self.observed,
+            'metrics': metrics,
+            'histograms': {k: dict(sorted(v.items())) for k, v in sorted(self.histograms.items())},
+            'throttle_events_per_hour': {h: c for h, c in sorted(self.throttle_events.items()) if c},
+            'error_windows': sorted(self.error_windows.values(), key=lambda e: e['time'])
+        }
+
+def _analyze_log_chunk(task: Tuple) -> LogAggregate:
+    """Process-pool worker: aggregate one byte range of one log file"""
+    file_index, path, fmt, start, end, thresholds, window, warmup = task
+    aggregate = LogAggregate(file_index, thresholds, window)
+    aggregate.bytes = end - start
+    parse = LOG_PARSERS[fmt]
+    
+    header = None
+    if fmt == 'csv':
+        with open(path, 'rb') as f:
+            first = f.readline().decode('utf-8', 'replace').strip()
+        if first.startswith('timestamp,'):
+            header = first.split(',')
+    
+    for owned, record in _iter_log_records(path, start, end, LOG_RECORD_MARKERS[fmt], warmup):
+        try:
+            sample = parse(record, header)
+        except (ValueError, KeyError, TypeError, IndexError):
+            sample = None
+        if sample is None:
+            if owned and record.strip() and not record.startswith(b'timestamp,'):
+                aggregate.bad_records += 1
+            continue
+        aggregate.add(owned, *sample)
+    aggregate._recent.clear()  # Window buffer is not part of the result
+    return aggregate
+
+class LogAnalyzer:
+    """Parallel analyzer for txt/json/csv logs written by export_data"""
+
+    def __init__(self, thresholds: Optional[Dict[str, float]] = None, window: float = 30.0,
+                 workers: Optional[int] = None, chunk_mb: float = 64, warmup_mb: float = 4):
+        self.thresholds = dict(thresholds or DEFAULT_THRESHOLDS)
+        self.window = window
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = max(1, int(chunk_mb * (1 << 20)))
+        self.warmup = int(warmup_mb * (1 << 20))
+
+    def plan(self, paths: List[str]) -> List[Tuple]:
+        """Split files into byte ranges, one task per worker invocation"""
+        tasks = []
+        for index, path in enumerate(paths):
+            fmt = _detect_log_format(path)
+            size = os.path.getsize(path)
+            for start in range(0, max(size, 1), self.chunk_size):
+                end = min(size, start + self.chunk_size)
+                tasks.append((index, path, fmt, start, end, self.thresholds, self.window, self.warmup))
+        return tasks
+
+    def analyze(self, paths: List[str]) -> Dict:
+        from concurrent.futures import ProcessPoolExecutor
+        
+        started = time.perf_counter()
+        tasks = self.plan(paths)
+        if self.workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                partials = list(pool.map(_analyze_log_chunk, tasks))
+        else:
+            partials = [_analyze_log_chunk(task) for task in tasks]
+        
+        total = LogAggregate(0, self.thresholds, self.window)
+        for partial in partials:  # pool.map keeps file/offset order
+            total.merge(partial)
+        elapsed = time.perf_counter() - started
+        
+        report = total.report()
+        report.update({
+            'files': list(paths),
+            'tasks': len(tasks),
+            'workers': self.workers,
+            'bytes': total.bytes,
+            'elapsed_seconds': elapsed,
+            'throughput_mb_s': total.bytes / (1 << 20) / elapsed if elapsed > 0 else 0.0
+        })
+        return report
+
+def _synthetic_collectors(cpu: float, gpu: float, power: float, throttled: bool) -> Tuple:
+    """Collector outputs shaped like the real ones, for benchmarks"""
+    temperatures = [TempReading('CPU (Tctl)', round(cpu, 1), 'k10temp'),
+                    TempReading('NVMe Composite', round(cpu * 0.7, 1), 'nvme', 84.8),
+                    TempReading('GPU (RTX 3070)', round(gpu, 1), 'nvidia')]
+    gpu_info = {
+        'available': True, 'temp': round(gpu, 1), 'power': round(power, 1), 'utilization': 80.0,
+        'memory_used': 4200.0, 'memory_total': 8192.0, 'memory_percent': 51.3,
+        'clock_core': 1620.0, 'clock_memory': 6000.0, 'fan_speed': 0, 'power_limit': 130.0,
+        'throttle_reasons': ['thermal_throttling'] if throttled else [],
+        'driver_version': '550.54.14', 'status': 'nvidia-smi working'
+    }
+    metrics = {
+        'cpu_usage': 50.0, 'cpu_freq': 3200.0,
+        'memory': {'percent': 60.0, 'used_gb': 18.2, 'total_gb': 31.3, 'available_gb': 13.1},
+        'load_average': {'1m': 2.5, '5m': 2.1, '15m': 1.8},
+        'uptime_hours': 5.2, 'boot_time': '2024-01-01 00:00:00', 'processes': 412,
+        'disk_usage': [{'device': '/dev/nvme0n1p2', 'mountpoint': '/', 'percent': 48.0,
+                        'used_gb': 245.0, 'total_gb': 512.0}]
+    }
+    battery = {'present': True, 'percent': 95, 'charging': True, 'voltage': 17.2, 'power_source': 'AC'}
+    return temperatures, gpu_info, metrics, battery
+
+def generate_synthetic_log(path: str, size_mb: float, interval: float = 2.0):
+    """Write a JSON export-format log of roughly size_mb for benchmarking"""
+    import random
+    rng = random.Random(42)
+    target = int(size_mb * (1 << 20))
+    clock = datetime.datetime(2024, 1, 1).timestamp()
+    cpu, gpu, power, throttled = 55.0, 50.0, 60.0, False
+    sampling = {'mode': 'fixed', 'interval': interval}
+    written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < target:
+            # Mean-reverting random walks with occasional excursions past the limits
+            cpu = min(98.0, max(40.0, cpu + rng.uniform(-2, 2) + (65 - cpu) * 0.02))
+            gpu = min(90.0, max(35.0, gpu + rng.uniform(-2, 2) + (62 - gpu) * 0.02))
+            power = min(140.0, max(10.0, power + rng.uniform(-8, 8) + (80 - power) * 0.05))
+            throttled = (gpu > 80 or power > 125) if not throttled else gpu > 74
+            errors = []
+            if rng.random() < 0.002:
+                realtime = int(clock * 1e6) - rng.randint(0, int(interval * 1e6))
+                errors.append({'timestamp': str(realtime), 'message': f'synthetic error {written}',
+                               'unit': 'synthetic.service', 'priority': '3'})
+            snapshot = Snapshot(*_synthetic_collectors(cpu, gpu, power, throttled), errors, when=clock)
+            snapshot.set_sampling(sampling)
+            line = ENCODER.json_line(snapshot)
+            f.write(line)
+            written += len(line)
+            clock += interval
+
+def _legacy_state_tick(temperatures, gpu_info, metrics, battery, pressure, energy, sampling) -> Dict:
+    """Pre-snapshot tick for comparison: nested state dict, flattened, then JSON and CSV formatted"""
+    state = {
+        'timestamp': datetime.datetime.now().isoformat(),
+        'temperatures': [{'name': t.name, 'temp': t.temp, 'source': t.source, 'critical': t.critical} for t in temperatures],
+        'gpu': gpu_info, 'system': metrics, 'battery': battery,
+        'pressure': {resource: {kind: dict(values) for kind, values in kinds.items()}
+                     for resource, kinds in pressure.items()},
+        'energy': {source: dict(measured) for source, measured in energy.items()},
+        'errors': [], 'warnings': [], 'alerts_today': 0, 'sampling': dict(sampling)
+    }
+    flatten_state(state)
+    json.dumps(state, ensure_ascii=False, indent=2)
+    csv_line = f"{state['timestamp']},{state['system']['cpu_usage']:.1f},{state['system']['memory']['percent']:.1f}"
+    csv_line += f",{state['gpu']['temp']:.1f},{state['gpu']['power']:.1f}"
+    for temp in state['temperatures']:
+        csv_line += f",{temp['temp']:.1f}"
+    for kinds in state['pressure'].values():
+        for values in kinds.values():
+            csv_line += f",{values['avg10']:.2f},{values['avg60']:.2f},{values['total']:.3f}"
+    for measured in state['energy'].values():
+        csv_line += f",{measured['j']:.1f},{measured['w']:.1f},{measured['session_j']:.1f},{measured['session_w']:.1f}"
+    csv_line += f",{len(state['warnings'])},{state['sampling']['interval']:.3f}\n"
+    return state
+
+def _snapshot_tick(temperatures, gpu_info, metrics, battery, pressure, energy, sampling) -> Snapshot:
+    snapshot = Snapshot(temperatures, gpu_info, metrics, battery, pressure=pressure, energy=energy)
+    snapshot.set_sampling(sampling)
+    snapshot.as_dict()
+    ENCODER.json_line(snapshot)
+    ENCODER.csv_row(snapshot)
+    return snapshot
+
+def _bench_collectors(tick: int) -> Tuple:
+    """Fresh collector output for one tick, as analyze_system_state gets it (PSI and energy included)"""
+    drift = tick % 10 * 0.1
+    pressure = {resource: {kind: {'avg10': 1.5 + drift, 'avg60': 0.8, 'avg300': 0.3, 'total': 812.345678 + tick}
+                           for kind in ('some', 'full')} for resource in PSI_RESOURCES}
+    energy = {source: {'j': 120.0 + drift, 'w': 60.0 + drift, 'session_j': 86400.0 + tick, 'session_w': 58.5}
+              for source in ENERGY_SOURCES}
+    sampling = {'mode': 'fixed', 'interval': 2.0, 'period': 2.0 + drift / 100, 'rate_hz': 0.5,
+                'limiting': None, 'headroom': None}
+    return _synthetic_collectors(62.0 + drift, 58.0 - drift, 85.0 + drift, False) + (pressure, energy, sampling)
+
+def run_snapshot_benchmark(ticks: int = 2000):
+    """tracemalloc comparison of the per-tick model and serialization cost"""
+    import tracemalloc
+    print(f"{Fore.CYAN + Style.BRIGHT}🧪 Snapshot model benchmark ({ticks} ticks, {len(METRIC_KEYS)} metrics, "
+          f"JSON + CSV per tick){Style.RESET_ALL}")
+    results = {}
+    for name, tick in (('legacy dict', _legacy_state_tick), ('snapshot', _snapshot_tick)):
+        history = []
+        tracemalloc.start()
+        transient = 0
+        elapsed = 0.0
+        for n in range(ticks):
+            # Both models get the same fresh dicts every tick; what history keeps of them is 'retained'
+            collectors = _bench_collectors(n)
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+            history.append(tick(*collectors))
+            elapsed += time.perf_counter() - started
+            transient += tracemalloc.get_traced_memory()[1] - before
+            del collectors
+        retained = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[name] = (transient / ticks, retained / ticks, elapsed / ticks * 1e6)
+        print(f"  {name:<12} peak {transient / ticks:8.0f} B/tick  retained {retained / ticks:7.0f} B/tick  " +
+              f"{elapsed / ticks * 1e6:6.1f} µs/tick (traced)")
+    
+    legacy, snapshot = results['legacy dict'], results['snapshot']
+    print(f"  {Fore.GREEN}peak x{legacy[0] / snapshot[0]:.1f} smaller, retained x{legacy[1] / snapshot[1]:.1f} smaller{Style.RESET_ALL}")
+
+IDLE_LEAD = 600.0  # Seconds of idle before the synthetic ramp
+RAMP_OFFSETS = 40   # Ramp start positions swept across the longest sampling period
+
+def _ramp_profile(rate: float, threshold: float, start: float = IDLE_LEAD) -> Tuple:
+    """CPU temperature of a synthetic session: idle until `start`, ramp at `rate` °C/s to 95°C,
+    5 min hold, cool-down, 10 min idle. Returns (temp(t), threshold crossing time, duration)"""
+    idle, peak, cooling = 45.0, 95.0, 0.5
+    top = start + (peak - idle) / rate
+    hold = top + 300.0
+
+    def temp(t: float) -> float:
+        if t < start:
+            return idle + math.sin(t / 7.0) * 0.5
+        if t < top:
+            return idle + (t - start) * rate
+        if t < hold:
+            return peak
+        return max(idle, peak - (t - hold) * cooling)
+
+    return temp, start + (threshold - idle) / rate, hold + (peak - idle) / cooling + 600.0
+
+def _simulate_sampling(temp, duration: float, threshold: float, sampler: Optional[AdaptiveSampler],
+                       interval: float, on_battery: bool) -> Tuple:
+    """Walk one session: (samples, samples while idle, first time above threshold, seconds in update())"""
+    t = cost = 0.0
+    samples = idle = 0
+    detected = None
+    while t < duration:
+        value = temp(t)
+        samples += 1
+        idle += t < IDLE_LEAD
+        if detected is None and value > threshold:
+            detected = t
+        if sampler:
+            started = time.perf_counter()
+            step = sampler.update({'cpu_temp': value}, on_battery, now=t)
+            cost += time.perf_counter() - started
+        else:
+            step = interval
+        t += step
+    return samples, idle, detected, cost
+
+def run_sampler_benchmark(interval: float = 2.0, min_interval: float = 0.1, max_interval: float = 10.0):
+    """Samples taken and threshold detection latency: fixed interval vs AdaptiveSampler"""
+    threshold = DEFAULT_THRESHOLDS['cpu_temp']
+    # Where the ramp starts relative to the sampling grid decides the latency, so sweep
+    # the start across the longest period instead of starting on a sample instant
+    offsets = [max(interval, max_interval) * (i + 0.5) / RAMP_OFFSETS for i in range(RAMP_OFFSETS)]
+    print(f"{Fore.CYAN + Style.BRIGHT}🧪 Adaptive sampling benchmark (synthetic CPU ramp through {threshold:g}°C, "
+          f"{RAMP_OFFSETS} ramp start offsets){Style.RESET_ALL}")
+    strategies = (('fixed', None), ('adaptive AC', False), ('adaptive battery', True))
+    for rate in (0.5, 5.0):
+        print(f"  Ramp {rate:g}°C/s starting {IDLE_LEAD:.0f}-{IDLE_LEAD + offsets[-1]:.0f}s into the session")
+        for name, on_battery in strategies:
+            latencies = []
+            samples = idle = updates = 0
+            cost = 0.0
+            for offset in offsets:
+                temp, crossing, duration = _ramp_profile(rate, threshold, IDLE_LEAD + offset)
+                sampler = None
+                if on_battery is not None:
+                    sampler = AdaptiveSampler(DEFAULT_THRESHOLDS, min_interval, max_interval, ac_interval=interval)
+                taken, quiet, detected, spent = _simulate_sampling(temp, duration, threshold, sampler,
+                                                                   interval, bool(on_battery))
+                samples += taken
+                idle += quiet
+                cost += spent
+                updates += taken if sampler else 0
+                if detected is not None:
+                    latencies.append(detected - crossing)
+            missed = len(offsets) - len(latencies)
+            if latencies:
+                latency = f"mean +{sum(latencies) / len(latencies):5.2f}s  max +{max(latencies):5.2f}s"
+            else:
+                latency = "missed"
+            if missed and latencies:
+                latency += f"  ({missed} missed)"
+            overhead = f"{cost / updates * 1e6:5.1f} µs/update" if updates else ""
+            print(f"    {name:<17} {samples / len(offsets):6.0f} samples ({idle / len(offsets):4.0f} while idle)  "
+                  f"detection {latency}  {overhead}")
+
+def print_analysis_report(report: Dict, max_errors: int = 20):
+    """Human-readable correlation report"""
+    print(f"{Fore.CYAN + Style.BRIGHT}📊 Log analysis: {len(report['files'])} file(s), "
+          f"{report['records']} records, {report['bad_records']} unparsed{Style.RESET_ALL}")
+    print(f"   {report['bytes'] / (1 << 20):.1f} MB in {report['elapsed_seconds']:.2f}s "
+          f"({Fore.GREEN}{report['throughput_mb_s']:.1f} MB/s{Style.RESET_ALL}, "
+          f"{report['tasks']} chunks, {report['workers']} workers)")
+    print(f"   Observed: {report['observed_seconds'] / 3600:.2f}h")
+    
+    print(f"\n{Fore.WHITE + Style.BRIGHT}Metrics:{Style.RESET_ALL}")
+    for key, metric in report['metrics'].items():
+        line = f"  {key:<16} min {metric['min']:7.1f}  mean {metric['mean']:7.1f}  max {metric['max']:7.1f}"
+        if 'threshold' in metric:
+            color = Fore.RED if metric['seconds_above'] else Fore.GREEN
+            line += (f"  {color}>{metric['threshold']:g}: {metric['seconds_above']:.0f}s "
+                     f"({metric['percent_above']:.1f}%){Style.RESET_ALL}")
+        print(line)
+    
+    for key, hist in report['histograms'].items():
+        print(f"\n{Fore.WHITE + Style.BRIGHT}Histogram {key}:{Style.RESET_ALL}")
+        peak = max(hist.values())
+        width = HISTOGRAM_BINS[key]
+        for bucket, count in hist.items():
+            bar = '█' * max(1, int(count / peak * 40))
+            print(f"  {bucket:5.0f}-{bucket + width:<5.0f} {bar} {count}")
+    
+    print(f"\n{Fore.WHITE + Style.BRIGHT}GPU throttle events per hour:{Style.RESET_ALL}")
+    if not report['throttle_events_per_hour']:
+        print("  none")
+    for hour, count in report['throttle_events_per_hour'].items():
+        print(f"  {hour.replace('T', ' ')}:00  {count}")
+    
+    errors = report['error_windows']
+    print(f"\n{Fore.WHITE + Style.BRIGHT}Journal errors ({len(errors)}), "
+          f"last {report.get('window', 30):g}s before each:{Style.RESET_ALL}")
+    for error in errors[:max_errors]:
+        parts = []
+        for metric in WINDOW_METRICS:
+            if metric in error:
+                parts.append(f"{metric} max {error[metric]['max']:.1f}/avg {error[metric]['mean']:.1f}")
+        context = ', '.join(parts) if parts else 'no samples'
+        throttle = f" {Fore.RED}THROTTLING{Style.RESET_ALL}" if error['throttled'] else ""
+        print(f"  {error['time'][:19]} {Fore.YELLOW}{error['message'][:60]}{Style.RESET_ALL}")
+        print(f"      {error['samples']} samples: {context}{throttle}")
+    if len(errors) > max_errors:
+        print(f"  ... {len(errors) - max_errors} more (see --report-json)")
+
+def run_analyzer(args):
+    """Entry point of the `analyze` subcommand"""
+    paths = list(args.files)
+    if args.generate:
+        print(f"{Fore.CYAN}Generating {args.size_mb:g} MB synthetic log: {args.generate}{Style.RESET_ALL}")
+        generate_synthetic_log(args.generate, args.size_mb)
+        paths.append(args.generate)
+    if not paths:
+        print(f"{Fore.RED}No log files given{Style.RESET_ALL}")
+        return 1
+    
+    analyzer = LogAnalyzer(window=args.window, workers=args.workers, chunk_mb=args.chunk_mb)
+    report = analyzer.analyze(paths)
+    report['window'] = args.window
+    print_analysis_report(report)
+    
+    if args.report_json:
+        with open(args.report_json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n{Fore.GREEN}✓ Report saved to {args.report_json}{Style.RESET_ALL}")
+    return 0
+
+# Browser dashboard: snapshot + server-sent-event deltas from the running monitor
+DASHBOARD_PORT = 8088
+DASHBOARD_ASSETS = Path(__file__).resolve().parent / 'static'
+DASHBOARD_FILES = {'/': ('dashboard.html', 'text/html; charset=utf-8')}
+
+class DashboardServer:
+    """Built-in HTTP dashboard; every tick is serialized once for all clients"""
+
+    def __init__(self, address: Tuple[str, int], thresholds: Dict[str, float],
+                 history: Optional[List[Snapshot]] = None, retention: int = 300, backlog: int = 256):
+        self.address = address
+        self.thresholds = thresholds
+        self.frames = deque(maxlen=retention)   # full per-tick values for the snapshot
+        self.events = deque(maxlen=backlog)     # (seq, encoded SSE delta) ring
+        self.seq = 0
+        # Event ids are "<epoch>-<seq>": a tab left open across a monitor restart
+        # presents an id from another epoch and gets a fresh snapshot
+        self.epoch = format(int(time.time() * 1000), 'x')
+        self._last = {}
+        self._snapshot = (-1, b'')
+        self._metrics = b'# EOF\n'
+        self._cond = threading.Condition()
+        self._server = None
+        for state in history or []:
+            self.publish(state)
+
+    def publish(self, snapshot: Snapshot):
+        """Record one tick and wake every connected stream"""
+        values = {key: round(value, 3) for key, value in zip(METRIC_KEYS, snapshot.values) if value == value}
+        delta = {key: value for key, value in values.items() if self._last.get(key) != value}
+        for key in self._last.keys() - values.keys():
+            delta[key] = None
+        
+        with self._cond:
+            self.seq += 1
+            payload = json.dumps({'seq': self.seq, 't': snapshot.time, 'd': delta}, separators=(',', ':'))
+            self.frames.append((self.seq, snapshot.time, values))
+            self.events.append((self.seq, f"id: {self.epoch}-{self.seq}\ndata: {payload}\n\n".encode('utf-8')))
+            self._metrics = ENCODER.openmetrics(snapshot).encode('utf-8')
+            self._last = values
+            self._cond.notify_all()
+
+    def snapshot(self) -> bytes:
+        """Full history as one SSE event, rebuilt at most once per tick"""
+        with self._cond:
+            if self._snapshot[0] != self.seq:
+                frames = [{'seq': seq, 't': ts, 'v': values} for seq, ts, values in self.frames]
+                payload = json.dumps({'seq': self.seq, 'thresholds': self.thresholds, 'frames': frames},
+                                     separators=(',', ':'))
+                self._snapshot = (self.seq, f"id: {self.epoch}-{self.seq}\nevent: snapshot\ndata: {payload}\n\n".encode('utf-8'))
+            return self._snapshot[1]
+
+    def wait_events(self, after: int, timeout: float) -> Tuple[int, List[bytes]]:
+        """(seq, encoded deltas newer than `after`); empty on timeout, None if `after` left the ring"""
+        with self._cond:
+            # Ahead of us (another session) or already evicted: resend the snapshot now
+            if after > self.seq or (self.events and after < self.events[0][0] - 1):
+                return self.seq, None
+            self._cond.wait_for(lambda: self.seq > after or not self._server, timeout)
+            if self.seq == after:
+                return after, []
+            if not self.events or self.events[0][0] > after + 1:
+                return self.seq, None
+            return self.seq, [data for seq, data in self.events if seq > after]
+
+    def _handler(self):
+        dashboard = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def log_message(self, fmt, *args):
+                pass  # Keep the TUI clean
+            
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/events':
+                    return self._stream()
+                if path == '/metrics':
+                    return self._send(dashboard._metrics,
+                                      'application/openmetrics-text; version=1.0.0; charset=utf-8')
+                if path not in DASHBOARD_FILES:
+                    return self.send_error(404)
+                name, content_type = DASHBOARD_FILES[path]
+                try:
+                    body = (DASHBOARD_ASSETS / name).read_bytes()
+                except OSError:
+                    return self.send_error(500, f'missing asset {name}')
+                self._send(body, content_type)
+            
+            def _send(self, body: bytes, content_type: str):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def _stream(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                self.close_connection = True
+                
+                # EventSource reconnects with Last-Event-ID: resume if still in the ring
+                epoch, _, seq = self.headers.get('Last-Event-ID', '').rpartition('-')
+                try:
+                    sent = int(seq) if epoch == dashboard.epoch else -1
+                except ValueError:
+                    sent = -1
+                try:
+                    if sent < 0:
+                        sent = self._send_snapshot()
+                    while dashboard._server:
+                        seq, chunks = dashboard.wait_events(sent, 15.0)
+                        if chunks is None:
+                            sent = self._send_snapshot()
+                            continue
+                        self.wfile.write(b''.join(chunks) if chunks else b': keepalive\n\n')
+                        self.wfile.flush()
+                        sent = seq
+                except (BrokenPipeError, ConnectionResetError, OSError):
+                    pass
+            
+            def _send_snapshot(self) -> int:
+                with dashboard._cond:
+                    seq, data = dashboard.seq, dashboard.snapshot()
+                self.wfile.write(data)
+                self.wfile.flush()
+                return seq
+        
+        return Handler
+
+    def start(self):
+        self._server = ThreadingHTTPServer(self.address, self._handler())
+        self._server.daemon_threads = True
+        self.address = self._server.server_address
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self._server:
+            server, self._server = self._server, None
+            with self._cond:
+                self._cond.notify_all()
+            server.shutdown()
+            server.server_close()
+
+# Fleet mode: agents stream delta-encoded samples to one aggregator
+FLEET_PORT = 47800
+FLEET_MAGIC = b'LGNF'
+FLEET_VERSION = 1
+FLEET_HEADER = struct.Struct('<4sBB')     # magic, version, hostname length
+FLEET_COUNT = struct.Struct('<H')         # records in this packet
+FLEET_RECORD = struct.Struct('<IdBB')     # seq, unix time, flags, changed metrics
+FLEET_ENTRY = struct.Struct('<Bf')        # metric id (index in METRIC_KEYS), value
+FLEET_FRAME = struct.Struct('<I')         # TCP length prefix
+FLEET_KEYFRAME = 0x01
+FLEET_MAX_PACKET = 1200                   # Stay below a typical path MTU
+FLEET_DEADBAND = {'cpu_temp': 0.5, 'gpu_temp': 0.5, 'nvme_temp': 0.5, 'gpu_power': 1.0}
+
+def parse_address(value: str, default_host: str = '0.0.0.0', default_port: int = FLEET_PORT) -> Tuple[str, int]:
+    """'host:port', 'host' or 'port' -> (host, port)"""
+    host, _, port = value.rpartition(':')
+    if not host and not port.isdigit():
+        return port, default_port
+    return host or default_host, int(port) if port else default_port
+
+class FleetAgent:
+    """Sends changed metrics to an aggregator, batching and shedding load when it lags"""
+
+    def __init__(self, address: Tuple[str, int], proto: str = 'udp', hostname: Optional[str] = None,
+                 batch: int = 1, keyframe_every: int = 30, queue_limit: int = 64):
+        self.address = address
+        self.proto = proto
+        self.hostname = (hostname or os.uname().nodename).encode('utf-8')[:64]
+        self.batch = max(1, batch)
+        self.keyframe_every = keyframe_every
+        self.outbox = deque()
+        self.queue_limit = queue_limit
+        self.seq = 0
+        self.sent = 0
+        self.dropped = 0
+        self._last = [NAN] * len(METRIC_KEYS)
+        self._deadband = [FLEET_DEADBAND.get(key, 0.1) for key in METRIC_KEYS]
+        self._pending = []
+        self._force_keyframe = True
+        self._partial = b''
+        self._sock = None
+        self._connecting = 0.0  # TCP: monotonic deadline of a connect still in progress
+        self._retry_at = 0.0
+        self._prefix = FLEET_HEADER.pack(FLEET_MAGIC, FLEET_VERSION, len(self.hostname)) + self.hostname
+
+    def encode(self, values: List[float], timestamp: float) -> bytes:
+        """One record from a schema-ordered vector: all metrics on keyframes, else those that moved"""
+        keyframe = self._force_keyframe or self.seq % self.keyframe_every == 0
+        entries = []
+        last = self._last
+        for metric_id, value in enumerate(values):
+            if value != value:
+                continue  # NaN: metric not available on this host
+            previous = last[metric_id]  # NaN until first sent, which never compares below
+            if keyframe or not abs(value - previous) < self._deadband[metric_id]:
+                entries.append(FLEET_ENTRY.pack(metric_id, value))
+                last[metric_id] = value
+        record = FLEET_RECORD.pack(self.seq, timestamp, FLEET_KEYFRAME if keyframe else 0,
+                                   len(entries)) + b''.join(entries)
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        self._force_keyframe = False
+        return record
+
+    def submit(self, values: List[float], timestamp: Optional[float] = None):
+        self._pending.append(self.encode(values, time.time() if timestamp is None else timestamp))
+        if len(self._pending) >= self.batch:
+            self.flush()
+
+    def flush(self):
+        """Pack pending records into packets and try to send everything queued"""
+        while self._pending:
+            size = len(self._prefix) + FLEET_COUNT.size
+            count = 0
+            for record in self._pending:
+                if count and size + len(record) > FLEET_MAX_PACKET:
+                    break
+                size += len(record)
+                count += 1
+            records, self._pending = self._pending[:count], self._pending[count:]
+            self._enqueue(self._prefix + FLEET_COUNT.pack(count) + b''.join(records))
+        self._drain()
+
+    def _enqueue(self, packet: bytes):
+        if self.proto == 'tcp':
+            packet = FLEET_FRAME.pack(len(packet)) + packet
+        self.outbox.append(packet)
+        # Backpressure: shed the oldest samples, the next keyframe resyncs the aggregator
+        while len(self.outbox) > self.queue_limit:
+            self.outbox.popleft()
+            self.dropped += 1
+            self._force_keyframe = True
+
+    def _connect(self) -> bool:
+        """Non-blocking: a TCP connect is started here and completed on a later drain"""
+        if self._sock:
+            return not self._connecting or self._finish_connect()
+        if time.monotonic() < self._retry_at:
+            return False
+        try:
+            if self.proto == 'tcp':
+                sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                sock.setblocking(False)
+                err = sock.connect_ex(self.address)
+                if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+                    sock.close()
+                    raise OSError(err, os.strerror(err))
+                self._sock = sock
+                self._connecting = time.monotonic() + 5
+                return self._finish_connect()
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.connect(self.address)
+            sock.setblocking(False)
+            self._sock = sock
+            self._force_keyframe = True
+            return True
+        except OSError:
+            self._retry_at = time.monotonic() + 5
+            return False
+
+    def _finish_connect(self) -> bool:
+        """Poll the pending TCP connect without waiting"""
+        _, writable, _ = select.select([], [self._sock], [], 0)
+        if not writable:
+            if time.monotonic() > self._connecting:
+                self._disconnect()  # Unreachable: SYN retries would run for minutes
+                self._retry_at = time.monotonic() + 5
+            return False
+        err = self._sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+            self._disconnect()
+            self._retry_at = time.monotonic() + 5
+            return False
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._connecting = 0.0
+        self._force_keyframe = True
+        return True
+
+    def _disconnect(self):
+        try:
+            self._sock.close()
+        except OSError:
+            pass
+        self._sock = None
+        self._connecting = 0.0
+        self._partial = b''
+        self._force_keyframe = True
+        self._retry_at = time.monotonic() + 1
+
+    def _drain(self):
+        if not (self.outbox or self._partial) or not self._connect():
+            return
+        try:
+            while self.outbox or self._partial:
+                if self.proto == 'tcp':
+                    # The frame in flight leaves the queue so shedding never splits it
+                    if not self._partial:
+                        self._partial = self.outbox.popleft()
+                    written = self._sock.send(self._partial)
+                    self._partial = self._partial[written:]
+                    if self._partial:
+                        return
+                else:
+                    self._sock.send(self.outbox[0])
+                    self.outbox.popleft()
+                self.sent += 1
+        except (BlockingIOError, InterruptedError):
+            pass  # Kernel buffer full: keep the queue, it is bounded
+        except OSError:
+            if self.proto == 'tcp':
+                # Half-sent frame is gone with the connection
+                if self._partial:
+                    self.dropped += 1
+                self._disconnect()
+            else:
+                # UDP: e.g. ECONNREFUSED from a previous datagram, aggregator not up yet
+                self.outbox.popleft()
+                self.dropped += 1
+
+    def close(self):
+        self.flush()
+        if self._sock:
+            self._sock.close()
+            self._sock = None
+
+class FleetHost:
+    """Aggregator-side view of one agent"""
+    __slots__ = ('name', 'values', 'last_seq', 'last_seen', 'received', 'lost', 'synced', 'above')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.values = [math.nan] * len(METRIC_KEYS)
+        self.last_seq = None
+        self.last_seen = 0.0
+        self.received = 0
+        self.lost = 0
+        self.synced = False
+        self.above = set()
+
+class FleetAggregator:
+    """Merges agent streams into one time-aligned store with a combined view"""
+
+    # Batched agents deliver a second up to batch-1 seconds late, so the combined
+    # row reads a bucket this far behind the newest one
+    SETTLE = 5.0
+
+    def __init__(self, address: Tuple[str, int], proto: str = 'udp',
+                 thresholds: Optional[Dict[str, float]] = None,
+                 resolution: float = 1.0, retention: int = 300):
+        self.address = address
+        self.proto = proto
+        self.thresholds = dict(thresholds or DEFAULT_THRESHOLDS)
+        self.resolution = resolution
+        self.retention = retention
+        self.hosts = {}
+        self.store = deque()      # (bucket start, {host: values tuple}) oldest first, retention buckets wide
+        self.alerts = deque(maxlen=100)
+        self._limits = [(key, METRIC_KEYS.index(key), limit)
+                        for key, limit in self.thresholds.items() if key in METRIC_KEYS]
+        self.records = 0
+        self.expired = 0          # Samples that arrived after their bucket left the window
+        self.bad_packets = 0
+        self.running = True
+        self._selector = selectors.DefaultSelector()
+        self._buffers = {}
+        self._sock = None
+
+    def open(self):
+        if self.proto == 'tcp':
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(self.address)
+            sock.listen(512)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+            sock.bind(self.address)
+        sock.setblocking(False)
+        self._selector.register(sock, selectors.EVENT_READ, 'listen')
+        self._sock = sock
+        self.address = sock.getsockname()
+
+    def close(self):
+        for key in list(self._selector.get_map().values()):
+            key.fileobj.close()
+        self._selector.close()
+
+    def poll(self, timeout: float):
+        """Handle all socket events that arrive within timeout seconds"""
+        for key, _ in self._selector.select(timeout):
+            if key.data == 'listen' and self.proto == 'udp':
+                # Drain the socket: one wakeup, many datagrams
+                for _ in range(1024):
+                    try:
+                        self.ingest(self._sock.recv(65535))
+                    except (BlockingIOError, InterruptedError):
+                        break
+            elif key.data == 'listen':
+                try:
+                    conn, _ = self._sock.accept()
+                except (BlockingIOError, InterruptedError):
+                    continue
+                conn.setblocking(False)
+                self._buffers[conn] = b''
+                self._selector.register(conn, selectors.EVENT_READ, 'stream')
+            else:
+                self._read_stream(key.fileobj)
+
+    def _read_stream(self, conn):
+        try:
+            data = conn.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self._selector.unregister(conn)
+            del self._buffers[conn]
+            conn.close()
+            return
+        
+        buf = self._buffers[conn] + data
+        offset = 0
+        while len(buf) - offset >= FLEET_FRAME.size:
+            (length,) = FLEET_FRAME.unpack_from(buf, offset)
+            if length > 65535:
+                # Not our protocol: drop the connection rather than buffer forever
+                self.bad_packets += 1
+                self._selector.unregister(conn)
+                del self._buffers[conn]
+                conn.close()
+                return
+            if len(buf) - offset - FLEET_FRAME.size < length:
+                break
+            start = offset + FLEET_FRAME.size
+            self.ingest(buf[start:start + length])
+            offset = start + length
+        self._buffers[conn] = buf[offset:]
+
+    def ingest(self, packet: bytes):
+        """Apply every record of one packet to its host and the time-aligned store"""
+        try:
+            magic, version, name_len = FLEET_HEADER.unpack_from(packet, 0)
+            if magic != FLEET_MAGIC or version != FLEET_VERSION:
+                raise ValueError('foreign packet')
+            offset = FLEET_HEADER.size
+            name = packet[offset:offset + name_len].decode('utf-8', 'replace')
+            offset += name_len
+            (count,) = FLEET_COUNT.unpack_from(packet, offset)
+            offset += FLEET_COUNT.size
+            
+            host = self.hosts.get(name)
+            if host is None:
+                host = self.hosts[name] = FleetHost(name)
+            for _ in range(count):
+                seq, timestamp, flags, changed = FLEET_RECORD.unpack_from(packet, offset)
+                offset += FLEET_RECORD.size
+                if host.last_seq is not None:
+                    gap = (seq - host.last_seq - 1) & 0xFFFFFFFF
+                    if gap and gap < 0x80000000:
+                        host.lost += gap
+                        host.synced = False  # Missed deltas: stale until the next keyframe
+                if flags & FLEET_KEYFRAME:
+                    host.values = [math.nan] * len(METRIC_KEYS)
+                    host.synced = True
+                values = host.values
+                for metric_id, value in FLEET_ENTRY.iter_unpack(packet[offset:offset + changed * FLEET_ENTRY.size]):
+                    if metric_id < len(values):
+                        values[metric_id] = value
+                offset += changed * FLEET_ENTRY.size
+                host.last_seq = seq
+                host.last_seen = timestamp
+                host.received += 1
+                self.records += 1
+                self._store(name, timestamp, tuple(values))
+                self._check_thresholds(host)
+        except (struct.error, ValueError):
+            self.bad_packets += 1
+
+    def _store(self, name: str, timestamp: float, values: tuple):
+        bucket = timestamp - timestamp % self.resolution
+        store = self.store
+        if not store or bucket > store[-1][0]:
+            store.append((bucket, {}))
+            horizon = bucket - self.retention * self.resolution
+            while store[0][0] <= horizon:
+                store.popleft()
+            slot = store[-1][1]
+        elif bucket == store[-1][0]:
+            slot = store[-1][1]
+        elif bucket <= store[-1][0] - self.retention * self.resolution:
+            self.expired += 1
+            return
+        else:
+            # Late or batched sample: walk back to its bucket, or insert one in order
+            # when no other host has reported that second yet
+            position = len(store)
+            while position and store[position - 1][0] > bucket:
+                position -= 1
+            if position and store[position - 1][0] == bucket:
+                slot = store[position - 1][1]
+            else:
+                slot = {}
+                store.insert(position, (bucket, slot))
+        slot[name] = values
+
+    def combined(self, keys: Tuple[str, ...]) -> Optional[Tuple[float, int, List[float], List[float]]]:
+        """Hosts, mean and max per key across every host at one aligned second, SETTLE
+        behind the newest bucket; None until the window is that deep"""
+        if not self.store:
+            return None
+        target = self.store[-1][0] - self.SETTLE
+        for bucket, slot in reversed(self.store):
+            if bucket <= target:
+                break
+        else:
+            return None
+        ids = [METRIC_INDEX[key] for key in keys]
+        means, peaks = [], []
+        for metric_id in ids:
+            present = [values[metric_id] for values in slot.values() if values[metric_id] == values[metric_id]]
+            means.append(sum(present) / len(present) if present else NAN)
+            peaks.append(max(present) if present else NAN)
+        return bucket, len(slot), means, peaks
+
+    def _check_thresholds(self, host: FleetHost):
+        for key, metric_id, limit in self._limits:
+            value = host.values[metric_id]
+            if value > limit:
+                if key not in host.above:
+                    host.above.add(key)
+                    self.alerts.append(SystemAlert(
+                        timestamp=datetime.datetime.fromtimestamp(host.last_seen).isoformat(),
+                        level='CRITICAL', component=f'{host.name}/{key}',
+                        message=f'{host.name}: {key} {value:.1f} > {limit:g}',
+                        value=value, threshold=limit))
+            else:
+                host.above.discard(key)
+
+    def display(self):
+        """Combined dashboard: one row per host plus the latest alerts"""
+        now = time.time()
+        columns = ('cpu_temp', 'gpu_temp', 'nvme_temp', 'gpu_power', 'cpu_usage', 'memory_usage')
+        os.system('clear')
+        print(f"{Fore.CYAN + Style.BRIGHT}╔{'═' * 88}╗")
+        print(f"║{' ' * 25}LEGION FLEET AGGREGATOR ({self.proto.upper()} {self.address[0]}:{self.address[1]}){' ' * 10}║")
+        print(f"╚{'═' * 88}╝{Style.RESET_ALL}")
+        print(f"Хосты: {len(self.hosts)}  │  Записей: {self.records}  │  Битых пакетов: {self.bad_packets}  │  " +
+              f"Окно: {len(self.store)} x {self.resolution:g}s  │  Опоздали: {self.expired}\n")
+        print(f"{Fore.WHITE + Style.BRIGHT}{'HOST':<20} {'AGE':>5}  CPU°C  GPU°C  SSD°C   GPU W   CPU%   RAM%  THR  LOSS{Style.RESET_ALL}")
+        for name in sorted(self.hosts):
+            host = self.hosts[name]
+            row = dict(zip(METRIC_KEYS, host.values))
+            age = now - host.last_seen
+            age_color = Fore.RED if age > 10 else Fore.GREEN
+            cells = []
+            for key in columns:
+                value = row[key]
+                if math.isnan(value):
+                    cells.append(f"{'-':>6}")
+                    continue
+                limit = self.thresholds.get(key, 90)
+                if key.endswith('_temp'):
+                    color = EnhancedLegionMonitor.get_color_for_temp(value, limit)
+                else:
+                    color = EnhancedLegionMonitor.get_color_for_usage(value, limit)
+                cells.append(f"{color}{value:6.1f}{Style.RESET_ALL}")
+            throttle = f"{Fore.RED}YES{Style.RESET_ALL}" if row['gpu_throttle'] > 0 else " no"
+            total = host.received + host.lost
+            loss = host.lost / total * 100 if total else 0.0
+            stale = '~' if not host.synced else ' '
+            print(f"{name[:19]:<19}{stale} {age_color}{age:5.0f}{Style.RESET_ALL} " +
+                  ' '.join(cells) + f"  {throttle} {loss:4.1f}%")
+        
+        # Every host at the same second, read from the aligned window; AGE column holds the host count
+        fleet = self.combined(columns)
+        if fleet:
+            bucket, count, means, peaks = fleet
+            stamp = datetime.datetime.fromtimestamp(bucket).strftime('%H:%M:%S')
+            for label, row in (('mean', means), ('max', peaks)):
+                cells = ' '.join(f"{'-':>6}" if value != value else f"{value:6.1f}" for value in row)
+                print(f"{Style.BRIGHT}{f'FLEET {label} {stamp}':<20}{Style.RESET_ALL} {count:5d} {cells}")
+        
+        if self.alerts:
+            print(f"\n{Fore.RED + Style.BRIGHT}┌─ ПРЕДУПРЕЖДЕНИЯ ────────────────────────────────────────────────────┐{Style.RESET_ALL}")
+            for alert in list(self.alerts)[-8:]:
+                print(f"│ {Fore.RED}{alert.timestamp[11:19]} {alert.message:<60}{Style.RESET_ALL} │")
+            print(f"{Fore.RED + Style.BRIGHT}└──────────────────────────────────────────────────────────────────────┘{Style.RESET_ALL}")
+
+    def serve(self, refresh: float = 2.0, show: bool = True):
+        self.open()
+        next_draw = time.monotonic()
+        try:
+            while self.running:
+                self.poll(max(0.0, next_draw - time.monotonic()))
+                if time.monotonic() >= next_draw:
+                    if show:
+                        self.display()
+                    next_draw = time.monotonic() + refresh
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+def _fleet_bench_agents(address: Tuple[str, int], proto: str, agents: int, seconds: float):
+    """Benchmark load generator: `agents` simulated hosts at 1 Hz each"""
+    import random
+    rng = random.Random(7)
+    fleet = [FleetAgent(address, proto, hostname=f'legion-{i:04d}') for i in range(agents)]
+    state = [[rng.uniform(30, 70) for _ in METRIC_KEYS] for _ in range(agents)]
+    moving = [METRIC_INDEX[key] for key in ('cpu_temp', 'gpu_temp', 'gpu_power', 'cpu_usage')]
+    started = time.monotonic()
+    tick = 0
+    while time.monotonic() - started < seconds:
+        for i, agent in enumerate(fleet):
+            values = state[i]
+            for index in moving:
+                values[index] += rng.uniform(-1.5, 1.5)
+            agent.submit(values)
+        tick += 1
+        time.sleep(max(0.0, started + tick - time.monotonic()))
+    for agent in fleet:
+        agent.close()
+
+def run_fleet_benchmark(agents: int, proto: str = 'udp', seconds: float = 10.0):
+    """Loopback benchmark: aggregator CPU cost for `agents` hosts at 1 Hz"""
+    import multiprocessing
+    aggregator = FleetAggregator(('127.0.0.1', 0), proto)
+    aggregator.open()
+    sender = multiprocessing.Process(target=_fleet_bench_agents,
+                                     args=(aggregator.address, proto, agents, seconds), daemon=True)
+    
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    sender.start()
+    while sender.is_alive():
+        aggregator.poll(0.1)
+    aggregator.poll(0.5)
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    aggregator.close()
+    
+    expected = agents * int(seconds)
+    lost = sum(host.lost for host in aggregator.hosts.values())
+    print(f"{Fore.CYAN + Style.BRIGHT}🛰️  Fleet benchmark ({proto.upper()} loopback){Style.RESET_ALL}")
+    print(f"  Agents: {len(aggregator.hosts)}/{agents} at 1 Hz for {seconds:g}s")
+    print(f"  Records: {aggregator.records} (~{expected} expected), lost {lost}, bad packets {aggregator.bad_packets}")
+    print(f"  Ingest rate: {aggregator.records / wall:.0f} records/s")
+    print(f"  Aggregator CPU: {cpu:.2f}s over {wall:.1f}s = " +
+          f"{Fore.GREEN}{cpu / wall * 100:.1f}% of one core{Style.RESET_ALL}")
+
 def main():
     parser = argparse.ArgumentParser(description='Enhanced Legion 5 Pro System Monitor v3.0')
-    parser.add_argument('--export', choices=['json', 'txt', 'csv'], default='txt',
+    parser.add_argument('--export', choices=['json', 'txt', 'csv', 'bin', 'openmetrics'], default='txt',
                         help='Export format for data logging')
-    parser.add_argument('--interval', type=int, default=2,
-                        help='Update interval in seconds')
+    parser.add_argument('--interval', type=float, default=2,
+                        help='Update interval in seconds (slowest adaptive period on AC)')
+    parser.add_argument('--adaptive', action='store_true',
+                        help='Scale the interval with thermal headroom and its trend')
+    parser.add_argument('--min-interval', type=float, default=0.1,
+                        help='Shortest adaptive interval in seconds (near thresholds)')
+    parser.add_argument('--max-interval', type=float, default=10.0,
+                        help='Longest adaptive interval in seconds (idle on battery)')
     parser.add_argument('--test', action='store_true',
                         help='Test run - show sensor discovery and exit')
     
+    parser.add_argument('--psi-trigger-ms', type=float, default=150.0,
+                        help='PSI trigger: stall ms per 2 s window that wakes the monitor (0 = poll only)')
+    parser.add_argument('--energy-rate-hz', type=float, default=10.0,
+                        help='Battery/GPU power integration rate (0 = once per tick)')
+    parser.add_argument('--sysfs-root', default='/sys',
+                        help='Root of power_supply, powercap and hwmon for energy accounting')
+    parser.add_argument('--http', metavar='[HOST:]PORT', nargs='?', const=str(DASHBOARD_PORT),
+                        help=f'Serve a browser dashboard (default 127.0.0.1:{DASHBOARD_PORT})')
+    parser.add_argument('--agent', metavar='HOST[:PORT]',
+                        help=f'Fleet mode: stream samples to an aggregator (default port {FLEET_PORT})')
+    parser.add_argument('--aggregator', metavar='[HOST:]PORT', nargs='?', const=str(FLEET_PORT),
+                        help='Fleet mode: receive agent streams and show the combined dashboard')
+    parser.add_argument('--fleet-proto', choices=['udp', 'tcp'], default='udp',
+                        help='Fleet transport: UDP tolerates loss, TCP survives lossy links')
+    parser.add_argument('--fleet-batch', type=int, default=1,
+                        help='Samples per agent packet')
+    parser.add_argument('--snapshot-bench', type=int, metavar='TICKS', nargs='?', const=2000,
+                        help='tracemalloc benchmark of per-tick snapshot building and encoding')
+    parser.add_argument('--sampler-bench', action='store_true',
+                        help='Synthetic ramp: samples and detection latency, fixed --interval vs adaptive')
+    parser.add_argument('--fleet-bench', type=int, metavar='AGENTS',
+                        help='Loopback benchmark of the aggregator with AGENTS simulated hosts at 1 Hz')
+    
+    subparsers = parser.add_subparsers(dest='command')
+    analyze = subparsers.add_parser('analyze', help='Correlate thermals, throttling and errors in saved logs')
+    analyze.add_argument('files', nargs='*', help='Log files written by --export (json, csv or txt)')
+    analyze.add_argument('--window', type=float, default=30.0,
+                         help='Seconds of history to summarize before each journal error')
+    analyze.add_argument('--workers', type=int, default=None,
+                         help='Worker processes (default: CPU count)')
+    analyze.add_argument('--chunk-mb', type=float, default=64,
+                         help='Split files into chunks of this size, one per worker task')
+    analyze.add_argument('--report-json', metavar='PATH',
+                         help='Also write the full report as JSON')
+    analyze.add_argument('--generate', metavar='PATH',
+                         help='Generate a synthetic JSON log first and include it (benchmark)')
+    analyze.add_argument('--size-mb', type=float, default=1024,
+                         help='Size of the generated synthetic log')
+    
     args = parser.parse_args()
     
-    monitor = EnhancedLegionMonitor(export_format=args.export)
+    if args.command == 'analyze':
+        return run_analyzer(args)
+    
+    if args.snapshot_bench:
+        run_snapshot_benchmark(args.snapshot_bench)
+        return
+    
+    if args.sampler_bench:
+        run_sampler_benchmark(args.interval, args.min_interval, args.max_interval)
+        return
+    
+    if args.fleet_bench:
+        run_fleet_benchmark(args.fleet_bench, args.fleet_proto)
+        return
+    
+    if args.aggregator:
+        aggregator = FleetAggregator(parse_address(args.aggregator), args.fleet_proto)
+        aggregator.serve(refresh=args.interval)
+        return
+    
+    monitor = EnhancedLegionMonitor(export_format=args.export, interval=args.interval,
+                                    adaptive=args.adaptive, min_interval=args.min_interval,
+                                    max_interval=args.max_interval, psi_trigger_ms=args.psi_trigger_ms,
+                                    energy_rate_hz=args.energy_rate_hz, sysfs_root=args.sysfs_root)
     
     if args.test:
         print(f"{Fore.CYAN}🔍 Enhanced Legion Monitor Sensor Test:{Style.RESET_ALL}")
@@ -792,9 +2968,45 @@ def main():
         else:
             print(f"  {Fore.RED}❌ GPU not available{Style.RESET_ALL}")
         
+        print(f"\n{Fore.GREEN}Pressure Stall (PSI):{Style.RESET_ALL}")
+        pressure = monitor.pressure.read()
+        if not pressure:
+            print(f"  {Fore.YELLOW}not available{Style.RESET_ALL}")
+        for resource, kinds in pressure.items():
+            print(f"  {resource}: " + ", ".join(f"{kind} avg10={values['avg10']:.2f}%" for kind, values in kinds.items()))
+        
+        print(f"\n{Fore.GREEN}Energy Sources:{Style.RESET_ALL}")
+        for battery in monitor.energy.batteries:
+            print(f"  system: {battery} ({_read_sysfs(battery, 'status') or 'unknown'})")
+        for path, wrap in monitor.energy.counters:
+            print(f"  cpu: {path} ({monitor.energy.cpu_method}" + (f", wraps at {wrap / 1e6:.0f}J)" if wrap else ")"))
+        if monitor.energy.gpu_command:
+            monitor.energy.start()
+            time.sleep(0.5)
+            streaming = monitor.energy.gpu_streaming
+            monitor.energy.stop()
+            if streaming:
+                print(f"  gpu: {' '.join(monitor.energy.gpu_command)}")
+            else:
+                print(f"  gpu: {Fore.YELLOW}stream failed ({monitor.energy.gpu_error or 'exited'}), per-tick power.draw{Style.RESET_ALL}")
+        elif 'gpu' in monitor.energy.sources:
+            print("  gpu: per-tick power.draw")
+        if not monitor.energy.sources:
+            print(f"  {Fore.YELLOW}not available{Style.RESET_ALL}")
+        
+        return
+    
+    if args.agent:
+        agent = FleetAgent(parse_address(args.agent, default_host='127.0.0.1'), args.fleet_proto,
+                           batch=args.fleet_batch)
+        monitor.run_agent(agent)
         return
     
-    monitor.run(interval=args.interval)
+    if args.http:
+        monitor.dashboard = DashboardServer(parse_address(args.http, '127.0.0.1', DASHBOARD_PORT),
+                                            monitor.thresholds, monitor.data_history)
+    
+    monitor.run()
 
 def signal_handler(signum, frame):
     print(f"\n{Fore.YELLOW}Shutting down Enhanced Legion Monitor...{Style.RESET_ALL}")
@@ -803,4 +3015,4 @@ def signal_handler(signum, frame):
 if __name__ == "__main__":
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
-    main() 
\ No newline at end of file
+    sys.exit(main())
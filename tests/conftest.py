@@ -0,0 +1,5 @@
+import os
+import sys
+
+# enhanced_legion_monitor.py is a top-level script, not an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
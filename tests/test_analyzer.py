@@ -0,0 +1,69 @@
+"""LogAnalyzer: a log analysed whole and in tiny chunks must give the same report"""
+
+import datetime
+
+import pytest
+
+from enhanced_legion_monitor import ENCODER, MAX_SAMPLE_GAP, LogAnalyzer, Snapshot, _synthetic_collectors
+
+RECORDS = 600
+INTERVAL = 2.0
+CYCLE = 50    # records per cycle: one CPU excursion past 85°C and one GPU throttle run
+
+
+def write_log(path, fmt):
+    # Starts at 00:40 so throttle events land in two different hours
+    clock = datetime.datetime(2024, 1, 1, 0, 40).timestamp()
+    with open(path, 'w', encoding='utf-8') as f:
+        if fmt == 'csv':
+            f.write(ENCODER.csv_header)
+        for i in range(RECORDS):
+            phase = i % CYCLE
+            throttled = 30 <= phase < 37
+            cpu = 90.0 if 10 <= phase < 25 else 60.0
+            errors = []
+            if i % 37 == 5:
+                errors.append({'timestamp': str(int((clock - 1.0) * 1e6)), 'message': f'synthetic error {i}',
+                               'unit': 'synthetic.service', 'priority': '3'})
+            snapshot = Snapshot(*_synthetic_collectors(cpu, 82.0 if throttled else 60.0, 80.0, throttled),
+                                errors, when=clock)
+            snapshot.set_sampling({'interval': INTERVAL})
+            f.write(ENCODER.json_line(snapshot) if fmt == 'json' else ENCODER.csv_row(snapshot))
+            # One pause longer than MAX_SAMPLE_GAP: only that much of it counts as observed
+            clock += 600.0 if i == RECORDS // 2 else INTERVAL
+
+
+@pytest.fixture(params=['json', 'csv'])
+def log(request, tmp_path):
+    path = tmp_path / f'enhanced_legion.{request.param}'
+    write_log(path, request.param)
+    return request.param, str(path)
+
+
+@pytest.mark.parametrize('chunk_mb', [0.001, 0.0027])
+def test_chunked_analysis_matches_whole_file(log, chunk_mb):
+    fmt, path = log
+    whole = LogAnalyzer(workers=1, chunk_mb=1000).analyze([path])
+    # Warm-up must cover the 30 s error window (15 records) ahead of each chunk
+    chunked = LogAnalyzer(workers=1, chunk_mb=chunk_mb, warmup_mb=0.05).analyze([path])
+    assert whole['tasks'] == 1 and chunked['tasks'] > 40
+
+    assert chunked['records'] == whole['records'] == RECORDS
+    assert chunked['observed_seconds'] == pytest.approx(whole['observed_seconds'])
+    assert whole['observed_seconds'] == pytest.approx((RECORDS - 2) * INTERVAL + MAX_SAMPLE_GAP)
+    for key in ('cpu_temp', 'gpu_temp'):
+        above = whole['metrics'][key]['seconds_above']
+        assert above > 0
+        assert chunked['metrics'][key]['seconds_above'] == pytest.approx(above)
+
+    # One rising edge per cycle, however many chunks a throttle run is split across
+    assert sum(whole['throttle_events_per_hour'].values()) == RECORDS // CYCLE
+    assert len(whole['throttle_events_per_hour']) == 2
+    assert chunked['throttle_events_per_hour'] == whole['throttle_events_per_hour']
+
+    assert chunked['error_windows'] == whole['error_windows']
+    if fmt == 'json':
+        windows = whole['error_windows']
+        assert len(windows) == len(range(5, RECORDS, 37))
+        # Only the errors at the start of the log and right after the pause lack a full window
+        assert [window['covered'] for window in windows].count(False) == 2
@@ -0,0 +1,157 @@
+"""EnergyMeter against a fake sysfs tree (power_supply, powercap, hwmon)"""
+
+import math
+
+import pytest
+
+from enhanced_legion_monitor import EnergyMeter
+
+
+def write(path, value):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"{value}\n")
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    battery = tmp_path / 'class' / 'power_supply' / 'BAT0'
+    write(battery / 'status', 'Discharging')
+    write(battery / 'power_now', 40000000)        # uW
+    write(battery / 'voltage_now', 15800000)      # uV
+    rapl = tmp_path / 'class' / 'powercap' / 'intel-rapl:0'
+    write(rapl / 'name', 'package-0')
+    write(rapl / 'energy_uj', 1000)
+    write(rapl / 'max_energy_range_uj', 100000000)
+    write(rapl / 'intel-rapl:0:0' / 'name', 'core')   # subzone: must be ignored
+    write(rapl / 'intel-rapl:0:0' / 'energy_uj', 5)
+    hwmon = tmp_path / 'class' / 'hwmon' / 'hwmon3'
+    write(hwmon / 'name', 'amd_energy')
+    write(hwmon / 'energy1_label', 'Ecore000')
+    write(hwmon / 'energy1_input', 7)
+    write(hwmon / 'energy17_label', 'Esocket0')
+    write(hwmon / 'energy17_input', 2000000)
+    return tmp_path
+
+
+def battery(sysfs, name, value):
+    write(sysfs / 'class' / 'power_supply' / 'BAT0' / name, value)
+
+
+def rapl(sysfs, value):
+    write(sysfs / 'class' / 'powercap' / 'intel-rapl:0' / 'energy_uj', value)
+
+
+def test_discovery(sysfs):
+    meter = EnergyMeter(str(sysfs), rate_hz=0)
+    assert meter.sources == ['system', 'cpu']
+    assert meter.cpu_method == 'rapl'
+    assert meter.counters == [(str(sysfs / 'class/powercap/intel-rapl:0/energy_uj'), 100000000.0)]
+    assert meter.battery_voltage() == pytest.approx(15.8)
+
+
+def test_battery_trapezoid(sysfs):
+    meter = EnergyMeter(str(sysfs), rate_hz=10)
+    meter.sample(now=100.0)
+    battery(sysfs, 'power_now', 60000000)
+    meter.sample(now=101.0)
+    meter.sample(now=102.0)
+    # (40 + 60) / 2 * 1 s + 60 W * 1 s
+    assert meter._interval['system'] == pytest.approx([110.0, 2.0])
+
+
+def test_rapl_wraparound(sysfs):
+    meter = EnergyMeter(str(sysfs), rate_hz=10)
+    meter.sample(now=0.0)
+    rapl(sysfs, 99999000)
+    meter.sample(now=1.0)
+    rapl(sysfs, 1000)       # wrapped past max_energy_range_uj
+    meter.sample(now=2.0)
+    # 99.998 J, then (100000000 - 99999000 + 1000) uJ = 0.002 J
+    assert meter._interval['cpu'] == pytest.approx([100.0, 2.0])
+
+
+def test_hwmon_fallback_when_rapl_unreadable(sysfs):
+    energy_uj = sysfs / 'class' / 'powercap' / 'intel-rapl:0' / 'energy_uj'
+    energy_uj.unlink()
+    energy_uj.mkdir()       # Reading fails even as root
+    meter = EnergyMeter(str(sysfs), rate_hz=0)
+    assert meter.cpu_method == 'hwmon'
+    assert meter.counters == [(str(sysfs / 'class/hwmon/hwmon3/energy17_input'), 0.0)]
+
+
+def test_counter_reset_is_skipped(sysfs):
+    (sysfs / 'class' / 'powercap').rename(sysfs / 'powercap.off')
+    meter = EnergyMeter(str(sysfs), rate_hz=10)
+    counter = sysfs / 'class' / 'hwmon' / 'hwmon3' / 'energy17_input'
+    meter.sample(now=0.0)
+    write(counter, 7000000)
+    meter.sample(now=1.0)
+    write(counter, 500)     # Driver reload: no wrap range, the delta is dropped
+    meter.sample(now=2.0)
+    write(counter, 1500500)
+    meter.sample(now=3.0)
+    assert meter._interval['cpu'] == pytest.approx([6.5, 2.0])
+
+
+def test_gap_is_not_integrated(sysfs):
+    meter = EnergyMeter(str(sysfs), rate_hz=10)
+    meter.sample(now=0.0)
+    meter.sample(now=1.0)
+    meter.sample(now=1.0 + EnergyMeter.MAX_GAP + 1)
+    meter.sample(now=2.0 + EnergyMeter.MAX_GAP + 1)
+    assert meter._interval['system'] == pytest.approx([80.0, 2.0])
+
+
+def test_current_times_voltage_fallback(sysfs):
+    (sysfs / 'class' / 'power_supply' / 'BAT0' / 'power_now').unlink()
+    battery(sysfs, 'current_now', -2000000)  # Some drivers report discharge as negative
+    meter = EnergyMeter(str(sysfs), rate_hz=10)
+    assert meter._battery_power() == pytest.approx(31.6)
+    meter.sample(now=0.0)
+    meter.sample(now=2.0)
+    assert meter._interval['system'] == pytest.approx([63.2, 2.0])
+
+
+@pytest.mark.parametrize('status', ['Charging', 'Full', 'Not charging'])
+def test_no_system_energy_unless_discharging(sysfs, status):
+    battery(sysfs, 'status', status)
+    meter = EnergyMeter(str(sysfs), rate_hz=10)
+    for now in (0.0, 1.0, 2.0):
+        meter.sample(now=now)
+    assert meter._battery_power() is None
+    assert meter._interval['system'] == [0.0, 0.0]
+    assert 'system' not in meter.lap()
+
+
+def test_lap_reports_interval_and_session(sysfs):
+    meter = EnergyMeter(str(sysfs), rate_hz=10)
+    meter.sample(now=0.0)
+    meter.sample(now=1.0)
+    first = meter.lap(now=2.0)
+    assert first['system'] == pytest.approx({'j': 80.0, 'w': 40.0, 'session_j': 80.0, 'session_w': 40.0})
+    assert first['cpu'] == pytest.approx({'j': 0.0, 'w': 0.0, 'session_j': 0.0, 'session_w': 0.0})
+
+    battery(sysfs, 'status', 'Charging')
+    second = meter.lap(now=3.0)
+    assert second['system']['j'] == 0.0
+    assert math.isnan(second['system']['w'])
+    assert second['system']['session_j'] == pytest.approx(80.0)
+
+    meter.reset_session()
+    assert 'system' not in meter.lap(now=4.0)
+
+
+def test_per_tick_gpu_power(sysfs):
+    meter = EnergyMeter(str(sysfs), rate_hz=0, gpu=True)
+    assert 'gpu' in meter.sources
+    for when, watts in ((1000.0, 40.0), (1010.0, 60.0), (1020.0, 60.0)):
+        meter.add_power('gpu', watts, when)
+    assert meter._interval['gpu'] == pytest.approx([1100.0, 20.0])
+
+
+def test_per_tick_gap_is_not_integrated(sysfs):
+    meter = EnergyMeter(str(sysfs), rate_hz=0, gpu=True)
+    meter.add_power('gpu', 40.0, 1000.0)
+    meter.add_power('gpu', 40.0, 1000.0 + EnergyMeter.MAX_TICK_GAP + 1)
+    meter.add_power('gpu', 40.0, 1010.0 + EnergyMeter.MAX_TICK_GAP + 1)
+    assert meter._interval['gpu'] == pytest.approx([400.0, 10.0])
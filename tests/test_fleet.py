@@ -0,0 +1,45 @@
+"""FleetAggregator time-aligned store"""
+
+import math
+
+from enhanced_legion_monitor import METRIC_INDEX, METRIC_KEYS, FleetAggregator
+
+
+def values(cpu_temp):
+    row = [math.nan] * len(METRIC_KEYS)
+    row[METRIC_INDEX['cpu_temp']] = cpu_temp
+    return tuple(row)
+
+
+def test_batched_samples_behind_the_newest_bucket_are_kept():
+    # --fleet-batch 5: A's batch lands first, then B's older one
+    aggregator = FleetAggregator(('127.0.0.1', 0))
+    for t in (100.5, 101.5, 102.5, 103.5, 104.5):
+        aggregator._store('A', t, values(60.0))
+    for t in (98.2, 99.2, 100.2, 101.2, 102.2):
+        aggregator._store('B', t, values(70.0))
+    assert [(bucket, sorted(slot)) for bucket, slot in aggregator.store] == [
+        (98.0, ['B']), (99.0, ['B']), (100.0, ['A', 'B']), (101.0, ['A', 'B']),
+        (102.0, ['A', 'B']), (103.0, ['A']), (104.0, ['A'])]
+    assert aggregator.expired == 0
+
+
+def test_samples_older_than_the_window_are_counted():
+    aggregator = FleetAggregator(('127.0.0.1', 0), retention=10)
+    aggregator._store('A', 100.5, values(60.0))
+    aggregator._store('A', 120.5, values(60.0))
+    assert [bucket for bucket, _ in aggregator.store] == [120.0]
+    aggregator._store('B', 105.0, values(70.0))
+    assert aggregator.expired == 1
+
+
+def test_combined_row_reads_one_settled_second():
+    aggregator = FleetAggregator(('127.0.0.1', 0))
+    for t in range(100, 110):
+        aggregator._store('A', t + 0.5, values(60.0))
+        aggregator._store('B', t + 0.2, values(70.0))
+    bucket, hosts, means, peaks = aggregator.combined(('cpu_temp', 'gpu_temp'))
+    assert bucket == 109 - FleetAggregator.SETTLE
+    assert hosts == 2
+    assert means[0] == 65.0 and peaks[0] == 70.0
+    assert math.isnan(means[1]) and math.isnan(peaks[1])
@@ -0,0 +1,53 @@
+"""AdaptiveSampler period selection"""
+
+from enhanced_legion_monitor import DEFAULT_THRESHOLDS, AdaptiveSampler
+
+
+def sampler(**kwargs):
+    return AdaptiveSampler(DEFAULT_THRESHOLDS, min_interval=0.1, max_interval=10.0, **kwargs)
+
+
+def test_utilisation_does_not_shorten_the_period():
+    # Gaming load: pegged GPU and CPU must not pin the monitor at min_interval
+    thermal = {'cpu_temp': 60.0, 'gpu_temp': 65.0}
+    loaded = dict(thermal, gpu_utilization=99.0, cpu_usage=100.0, memory_usage=84.0, disk_usage=89.0)
+    interval = sampler().update(thermal, on_battery=False, now=0.0)
+    adaptive = sampler()
+    assert adaptive.update(loaded, on_battery=False, now=0.0) == interval > 0.1
+    assert adaptive.limiting == 'gpu_temp'
+    assert set(adaptive.headroom) == {'cpu_temp', 'gpu_temp'}
+
+
+def test_idle_temperatures_back_off_to_ac_interval():
+    adaptive = sampler(ac_interval=2.0)
+    values = {'gpu_utilization': 99.0, 'cpu_usage': 100.0, 'cpu_temp': 50.0, 'gpu_temp': 45.0}
+    assert adaptive.update(values, on_battery=False, now=0.0) == 2.0
+    assert adaptive.limiting is None
+
+
+def test_noisy_cpu_usage_does_not_feed_back():
+    adaptive = sampler()
+    for now, usage in enumerate((5.0, 100.0, 5.0, 100.0)):
+        interval = adaptive.update({'cpu_usage': usage, 'cpu_temp': 50.0}, on_battery=True, now=float(now))
+    assert interval == 10.0
+
+
+def test_temperature_near_threshold_samples_fast():
+    adaptive = sampler(ac_interval=2.0)
+    assert adaptive.update({'cpu_temp': 84.0}, on_battery=False, now=0.0) < 0.2
+    assert adaptive.limiting == 'cpu_temp'
+
+
+def test_rising_temperature_shortens_the_period():
+    adaptive = sampler()
+    adaptive.update({'cpu_temp': 50.0}, on_battery=True, now=0.0)
+    # 1°C/s with 30°C to go: ten samples before the crossing means at most 3 s
+    assert adaptive.update({'cpu_temp': 55.0}, on_battery=True, now=5.0) <= 3.0
+    assert adaptive.limiting == 'cpu_temp'
+
+
+def test_memory_pressure_drives_the_period():
+    adaptive = sampler()
+    adaptive.update({'psi_memory_some_avg10': 9.8, 'cpu_temp': 50.0}, on_battery=True, now=0.0)
+    assert adaptive.limiting == 'psi_memory_some_avg10'
+    assert adaptive.interval < 0.2